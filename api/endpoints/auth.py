@@ -16,6 +16,7 @@ from models.models import OAuthAccount, Platform, Role, User
 from schemas.common import DataResponse, MessageResponse
 from schemas.users import UserCreate, UserLogin, UserResponse
 from services.auth_service import AuthService
+from utils.database import invalidate_count_cache
 from utils.github_api import GitHubAPI
 from utils.gitee_api import GiteeAPI
 from utils.security import (
@@ -116,6 +117,7 @@ async def register(
     updated_at=now_time,
     role=Role.USER,
   )
+  invalidate_count_cache(User)
   access_token = create_user_access_token(user=user)
   response.set_cookie(
     "user_token",
@@ -389,6 +391,7 @@ async def oauth_register(
       github_name=github_user["login"],
       avatar=github_user["avatar_url"],
     )
+    invalidate_count_cache(User)
     await OAuthAccount.filter(platform=payload.platform, platform_id=payload.id).update(
       user_id=user.id
     )
@@ -406,6 +409,7 @@ async def oauth_register(
       gitee_name=gitee_user["login"],
       avatar=gitee_user["avatar_url"],
     )
+    invalidate_count_cache(User)
     await OAuthAccount.filter(platform=payload.platform, platform_id=payload.id).update(
       user_id=user.id
     )
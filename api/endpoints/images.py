@@ -10,6 +10,7 @@ from core.exceptions.client_errors import ResourceNotFoundError
 from models.models import Image
 from schemas.images import ImageResponse
 from schemas.common import DataResponse, MessageResponse
+from services.project_service import ProjectService
 from utils.security import UserPayloadData, verify_current_user
 
 router = APIRouter()
@@ -36,6 +37,8 @@ async def upload_image(
     user_id=payload.id,
     project_id=project_id,
   )
+  if project_id is not None:
+    ProjectService.invalidate_project_detail(project_id)
   return DataResponse(data=image)
 
 
@@ -57,4 +60,6 @@ async def delete_image(
     raise ResourceNotFoundError(resource="图片")
   os.remove(Settings.IMAGES_DIR / image.file_name)
   await image.delete()
+  if image.project_id is not None:  # pyright: ignore
+    ProjectService.invalidate_project_detail(image.project_id)  # pyright: ignore
   return MessageResponse(message="图片删除成功")
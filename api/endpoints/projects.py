@@ -1,6 +1,7 @@
 from typing import Annotated
-from fastapi import APIRouter, BackgroundTasks, Query, Security
+from fastapi import APIRouter, Depends, Query, Request, Security
 
+from config import Settings
 from core.exceptions import PermissionDeniedError
 from models.models import Platform, SyncLog
 from schemas.comments import CommentCreate, CommentResponse
@@ -15,6 +16,8 @@ from schemas.projects import (
   ProjectOwnerUpdate,
   ProjectPaginationParams,
   ProjectRepoDetail,
+  ProjectSearchPageParams,
+  ProjectSearchPageResponse,
   ProjectSearchParams,
 )
 from schemas.ratings import (
@@ -26,12 +29,15 @@ from schemas.ratings import (
 )
 from services.comment_service import CommentService
 from services.notification_service import NotificationService
-from services.project_service import ProjectService
+from services.project_service import ProjectService, project_detail_cache
 from services.rating_service import RatingService
+from services.related_service import RelatedService
 from services.user_service import UserService
-from tasks.elastic_sync import delete_project_from_es, sync_project_to_es
+from tasks.view_counter import view_counter
+from utils.http_cache import cache_control, etag_response, model_etag_response
 from utils.security import (
   UserPayloadData,
+  get_visitor_id,
   verify_current_admin_user,
   verify_current_user,
 )
@@ -41,14 +47,21 @@ router = APIRouter()
 
 
 @router.get("", response_model=PaginatedResponse[ProjectBaseResponse])
-async def get_projects(params: Annotated[ProjectPaginationParams, Query()]):
+async def get_projects(
+  request: Request, params: Annotated[ProjectPaginationParams, Query()]
+):
   result = await ProjectService.get_projects(params)
-  return PaginatedResponse(data=result)
+  return model_etag_response(
+    request, PaginatedResponse[ProjectBaseResponse], PaginatedResponse(data=result)
+  )
 
 
 @router.get("/suggest", response_model=DataResponse[list[str]])
-async def get_project_suggest(keyword: str):
-  result = await ProjectService.suggest_projects(keyword)
+async def get_project_suggest(
+  keyword: str,
+  limit: int = Query(Settings.SUGGEST_LIMIT, ge=1, le=Settings.SUGGEST_MAX_LIMIT),
+):
+  result = await ProjectService.suggest_projects(keyword, limit)
   return DataResponse(data=result)
 
 
@@ -58,12 +71,57 @@ async def search_projects(params: Annotated[ProjectSearchParams, Query()]):
   return DataResponse(data=result_ids)
 
 
+@router.get("/search/page", response_model=ProjectSearchPageResponse[int])
+async def search_projects_page(params: Annotated[ProjectSearchPageParams, Query()]):
+  result = await ProjectService.search_project_ids_page(params)
+  return ProjectSearchPageResponse(data=result)
+
+
+@router.get(
+  "/search/projects", response_model=ProjectSearchPageResponse[ProjectBaseResponse]
+)
+async def search_projects_hydrated(
+  params: Annotated[ProjectSearchPageParams, Query()],
+):
+  result = await ProjectService.search_projects_page(params)
+  return ProjectSearchPageResponse(data=result)
+
+
 @router.get("/related", response_model=DataResponse[list[ProjectBaseResponse]])
 async def get_related_projects(project_id: int):
   result = await ProjectService.get_related_projects(project_id)
   return DataResponse(data=result)
 
 
+# 有副作用的 GET，不能被浏览器缓存
+@router.get(
+  "/related/sync",
+  response_model=MessageResponse,
+  dependencies=[Depends(cache_control(no_store=True))],
+)
+async def sync_related_projects(
+  payload: UserPayloadData = Security(verify_current_admin_user),
+):
+  await RelatedService.rebuild()
+  return MessageResponse(message="相似项目同步成功")
+
+
+@router.get("/views/pending", response_model=DataResponse[int])
+async def get_pending_views(
+  payload: UserPayloadData = Security(verify_current_admin_user),
+):
+  """尚未写入数据库的浏览次数"""
+  return DataResponse(data=view_counter.pending)
+
+
+@router.get("/cache/stats", response_model=DataResponse[dict[str, int]])
+async def get_cache_stats(
+  payload: UserPayloadData = Security(verify_current_admin_user),
+):
+  """项目详情缓存的命中、未命中和淘汰次数"""
+  return DataResponse(data=project_detail_cache.stats())
+
+
 @router.get("/repo_detail", response_model=DataResponse[ProjectRepoDetail])
 async def get_repo_detail(platform: Platform, repo_id: str):
   result = await ProjectService.get_repo_detail(platform, repo_id)
@@ -116,17 +174,28 @@ async def get_my_rating(
   return DataResponse(data=result)
 
 
-@router.get("/{project_id}", response_model=DataResponse[ProjectFullResponse])
-async def get_project(project_id: int):
-  result = await ProjectService.get_project(project_id)
-  await ProjectService.increase_view_count(project_id)
+@router.get("/{project_id}/visitors", response_model=DataResponse[int])
+async def get_unique_visitors(
+  project_id: int,
+  days: int = Query(7, ge=1, le=Settings.VISITOR_MAX_DAYS),
+):
+  """最近 days 天的独立访客数（HyperLogLog 估计值）"""
+  result = await ProjectService.get_unique_visitors(project_id, days)
   return DataResponse(data=result)
 
 
+@router.get("/{project_id}", response_model=DataResponse[ProjectFullResponse])
+async def get_project(
+  request: Request, project_id: int, visitor: str = Depends(get_visitor_id)
+):
+  etag, content = await ProjectService.get_project_detail(project_id)
+  await ProjectService.increase_view_count(project_id, visitor)
+  return etag_response(request, content, etag)
+
+
 @router.post("", response_model=DataResponse[ProjectFullResponse])
 async def create_project(
   project_create: ProjectCreate,
-  background_tasks: BackgroundTasks,
   payload: UserPayloadData = Security(verify_current_user),
 ):
   repo_detail = await ProjectService.get_repo_detail(
@@ -147,7 +216,6 @@ async def create_project(
     user_id=payload.id,
     related_project=project.id,
   )
-  background_tasks.add_task(sync_project_to_es, project)
   return DataResponse(data=project)
 
 
@@ -201,7 +269,6 @@ async def create_rating(
 async def update_my_project(
   project_id: int,
   project_update: ProjectOwnerUpdate,
-  background_tasks: BackgroundTasks,
   payload: UserPayloadData = Security(verify_current_user),
 ):
   project = await ProjectService.get_project_shallow(project_id)
@@ -223,7 +290,6 @@ async def update_my_project(
   await NotificationService.notify_admins(
     f"项目 {project.name} 已被推荐者/所有者更新", related_project=project.id
   )
-  background_tasks.add_task(sync_project_to_es, project)
   return DataResponse(data=project)
 
 
@@ -256,7 +322,6 @@ async def reject_project(
 @router.put("/{project_id}/feature", response_model=DataResponse[ProjectFullResponse])
 async def feature_project(
   project_id: int,
-  background_tasks: BackgroundTasks,
   payload: UserPayloadData = Security(verify_current_admin_user),
 ):
   project = await ProjectService.feature_project(project_id)
@@ -265,14 +330,12 @@ async def feature_project(
     user_id=project.submitter_id,
     related_project=project.id,
   )
-  background_tasks.add_task(sync_project_to_es, project)
   return DataResponse(data=project)
 
 
 @router.put("/{project_id}/unfeature", response_model=DataResponse[ProjectFullResponse])
 async def unfeature_project(
   project_id: int,
-  background_tasks: BackgroundTasks,
   payload: UserPayloadData = Security(verify_current_admin_user),
 ):
   project = await ProjectService.unfeature_project(project_id)
@@ -281,7 +344,6 @@ async def unfeature_project(
     user_id=project.submitter_id,
     related_project=project.id,
   )
-  background_tasks.add_task(sync_project_to_es, project)
   return DataResponse(data=project)
 
 
@@ -299,11 +361,9 @@ async def update_rating(
 async def update_project(
   project_id: int,
   project_update: ProjectAdminUpdate,
-  background_tasks: BackgroundTasks,
   payload: UserPayloadData = Security(verify_current_admin_user),
 ):
   project = await ProjectService.update_project(project_id, project_update)
-  background_tasks.add_task(sync_project_to_es, project)
   return DataResponse(data=project)
 
 
@@ -315,12 +375,20 @@ async def delete_favorite(
   return MessageResponse(message="取消收藏成功")
 
 
+@router.delete(
+  "/{project_id}/rating", response_model=DataResponse[RatingModifiedResponse]
+)
+async def delete_rating(
+  project_id: int, payload: UserPayloadData = Security(verify_current_user)
+):
+  rating = await RatingService.delete_rating(project_id, payload.id)
+  return DataResponse(data=rating)
+
+
 @router.delete("/{project_id}", response_model=MessageResponse)
 async def delete_project(
   project_id: int,
-  background_tasks: BackgroundTasks,
   payload: UserPayloadData = Security(verify_current_admin_user),
 ):
   await ProjectService.delete_project(project_id)
-  background_tasks.add_task(delete_project_from_es, project_id)
   return MessageResponse(message="项目删除成功")
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Security
+from fastapi import APIRouter, BackgroundTasks, Depends, Security
 
 from schemas.common import DataResponse, MessageResponse
 from schemas.ratings import RatingCreate, RatingResponse, RatingUpdate
 from services.rating_service import RatingService
+from utils.http_cache import cache_control
 from utils.security import UserPayloadData, verify_current_admin_user, verify_current_user
 
 router = APIRouter()
 
 
-@router.get("/sync", response_model=MessageResponse)
-async def sync_rating(payload: UserPayloadData = Security(verify_current_admin_user)):
-  await RatingService.sync_rating()
-  return MessageResponse(message="评分同步成功")
+# 有副作用的 GET，不能被浏览器缓存
+@router.get(
+  "/sync",
+  response_model=MessageResponse,
+  dependencies=[Depends(cache_control(no_store=True))],
+)
+async def sync_rating(
+  background_tasks: BackgroundTasks,
+  incremental: bool = False,
+  payload: UserPayloadData = Security(verify_current_admin_user),
+):
+  if RatingService.is_syncing():
+    return MessageResponse(message="评分同步进行中")
+  background_tasks.add_task(RatingService.sync_rating, incremental)
+  return MessageResponse(message="评分同步已开始")
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Security
+from fastapi import APIRouter, Request, Security
 
 from schemas.common import DataResponse, MessageResponse
 from schemas.tags import TagCreate, TagResponse, TagUpdate
 from services.tag_service import TagService
+from utils.http_cache import model_etag_response
 from utils.security import UserPayloadData, verify_current_admin_user
 
 
@@ -10,15 +11,19 @@ router = APIRouter()
 
 
 @router.get("", response_model=DataResponse[list[TagResponse]])
-async def get_tags():
+async def get_tags(request: Request):
   result = await TagService.get_tags()
-  return DataResponse(data=result)
+  return model_etag_response(
+    request, DataResponse[list[TagResponse]], DataResponse(data=result)
+  )
 
 
 @router.get("/{tag_id}", response_model=DataResponse[TagResponse])
-async def get_tag(tag_id: int):
+async def get_tag(request: Request, tag_id: int):
   result = await TagService.get_tag(tag_id)
-  return DataResponse(data=result)
+  return model_etag_response(
+    request, DataResponse[TagResponse], DataResponse(data=result)
+  )
 
 
 @router.post("", response_model=DataResponse[TagResponse])
@@ -1,32 +1,42 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from api.endpoints import auth, users, projects, comments, tags, ratings, notifications, favorites, images
+from utils.http_cache import cache_control
 
 router = APIRouter()
 
 # 认证路由
-router.include_router(auth.router, prefix="/auth", tags=["认证"])
+router.include_router(auth.router, prefix="/auth", tags=["认证"],
+                      dependencies=[Depends(cache_control(no_store=True))])
 
 # 用户路由
-router.include_router(users.router, prefix="/users", tags=["用户"])
+router.include_router(users.router, prefix="/users", tags=["用户"],
+                      dependencies=[Depends(cache_control(max_age=60))])
 
 # 项目路由
-router.include_router(projects.router, prefix="/projects", tags=["项目"])
+router.include_router(projects.router, prefix="/projects", tags=["项目"],
+                      dependencies=[Depends(cache_control(max_age=30))])
 
 # 评论路由
-router.include_router(comments.router, prefix="/comments", tags=["评论"])
+router.include_router(comments.router, prefix="/comments", tags=["评论"],
+                      dependencies=[Depends(cache_control(max_age=30))])
 
 # 标签路由
-router.include_router(tags.router, prefix="/tags", tags=["标签"])
+router.include_router(tags.router, prefix="/tags", tags=["标签"],
+                      dependencies=[Depends(cache_control(max_age=300))])
 
 # 评分路由
-router.include_router(ratings.router, prefix="/ratings", tags=["评分"])
+router.include_router(ratings.router, prefix="/ratings", tags=["评分"],
+                      dependencies=[Depends(cache_control(max_age=30))])
 
 # 通知路由
 router.include_router(notifications.router,
-                      prefix="/notifications", tags=["通知"])
+                      prefix="/notifications", tags=["通知"],
+                      dependencies=[Depends(cache_control(public=False))])
 
 # 收藏路由
-router.include_router(favorites.router, prefix="/favorites", tags=["收藏"])
+router.include_router(favorites.router, prefix="/favorites", tags=["收藏"],
+                      dependencies=[Depends(cache_control(public=False))])
 
 # 图片路由
-router.include_router(images.router, prefix="/images", tags=["图片"])
+router.include_router(images.router, prefix="/images", tags=["图片"],
+                      dependencies=[Depends(cache_control(max_age=300))])
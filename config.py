@@ -23,8 +23,28 @@ class Settings:
   ELASTIC_PORT = os.getenv("ELASTIC_PORT", "9200")
   ELASTIC_APIKEY = os.getenv("ELASTIC_APIKEY")
   ELASTIC_URL = f"https://{ELASTIC_HOST}:{ELASTIC_PORT}"
+  # 搜索索引发件箱的轮询间隔、批量大小与重试退避（秒）
+  SEARCH_OUTBOX_INTERVAL = 5
+  SEARCH_OUTBOX_BATCH_SIZE = 500
+  SEARCH_OUTBOX_RETRY_BASE = 10
+  SEARCH_OUTBOX_RETRY_MAX = 3600
+  # 全量重建索引时每批写入的文档数
+  ELASTIC_REINDEX_CHUNK_SIZE = 1000
+  # 搜索分页 point-in-time 的保活时间，每次翻页都会续期
+  SEARCH_PIT_KEEP_ALIVE = "2m"
+  # 搜索分面每个字段返回的桶数及缓存配置
+  SEARCH_FACET_SIZE = 20
+  SEARCH_FACET_CACHE_SIZE = 1024
+  SEARCH_FACET_CACHE_TTL = 60
 
   GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+  # 可指向本地桩服务器调试，见 tests/github_stub.py
+  GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+  GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL}/graphql")
+  # 每次 GraphQL 查询的仓库数，GitHub 限制单次查询最多 100 个节点
+  GITHUB_GRAPHQL_BATCH_SIZE = 100
+  # 平台 API 配额剩余不超过该值时，后台同步等待配额重置
+  API_RATE_LIMIT_RESERVE = 50
 
   ACCESS_TOKEN_EXPIRE_SECONDS = 7 * 24 * 60 * 60
   JWT_ALGORITHM = "HS256"
@@ -39,5 +59,54 @@ class Settings:
   GITEE_REDIRECT_URI = os.getenv("GITEE_REDIRECT_URI")
   # GITEE_STATE = os.getenv("GITEE_STATE", "")
 
+  # 项目名称联想的默认/最大返回条数，以及排序字段（stars 或 view_count）
+  SUGGEST_LIMIT = 10
+  SUGGEST_MAX_LIMIT = 20
+  SUGGEST_RANK_FIELD = "stars"
+
+  # 分页总数缓存；估计行数超过阈值时使用估计值，None 表示始终精确计数
+  COUNT_CACHE_SIZE = 256
+  COUNT_CACHE_TTL = 300
+  COUNT_ESTIMATE_THRESHOLD = None
+  # 浏览量批量写入间隔（秒）与积压阈值
+  VIEW_COUNT_FLUSH_INTERVAL = 10
+  VIEW_COUNT_FLUSH_THRESHOLD = 1000
+  # 独立访客草图精度（寄存器数 2^p），修改后旧草图无法合并
+  VISITOR_SKETCH_PRECISION = 12
+  VISITOR_MAX_DAYS = 90
+  # 项目详情缓存
+  PROJECT_DETAIL_CACHE_SIZE = 2048
+  PROJECT_DETAIL_CACHE_TTL = 60
+  # 合并并发读请求时单次查询的超时（秒）
+  SINGLE_FLIGHT_TIMEOUT = 10
+  # 加权评分的先验权重（相当于多少个虚拟评分）、无评分时的默认平均分、全站平均分缓存时间
+  RATING_PRIOR_WEIGHT = 10
+  RATING_PRIOR_MEAN = 5.0
+  RATING_PRIOR_TTL = 3600
+  # 热度：重新计算间隔（秒）、衰减半衰期（小时）、统计窗口（天）、各项权重、搜索时的加权，
+  # 以及检查索引中 hot_score 映射的缓存时间（秒）
+  HOT_SCORE_INTERVAL = 600
+  HOT_SCORE_HALF_LIFE = 48
+  HOT_SCORE_WINDOW = 14
+  HOT_SCORE_WEIGHTS = {
+    "favorite": 3,
+    "comment": 2,
+    "rating": 1,
+    "star": 1,
+    "view": 0.5,
+  }
+  HOT_SCORE_SEARCH_BOOST = 1
+  HOT_SCORE_MAPPING_TTL = 300
+  # 评分汇总同步每批处理的项目数，增量同步回退的秒数
+  RATING_SYNC_CHUNK_SIZE = 500
+  RATING_SYNC_OVERLAP = 60
+  # 每个项目预先计算的相似项目数，计算相似度时每批的项目数
+  RELATED_TOP_K = 10
+  RELATED_BLOCK_SIZE = 256
+
   SYNC_INTERVAL = 600
   SYNC_FREQUENCY = 86400
+  # 仓库同步的并发数、每个平台的并发上限、每批读取的项目数
+  SYNC_WORKERS = 16
+  SYNC_PLATFORM_CONCURRENCY = {"GitHub": 8, "Gitee": 4}
+  SYNC_CHUNK_SIZE = 500
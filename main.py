@@ -8,9 +8,13 @@ from fastapi.staticfiles import StaticFiles
 from tortoise import connections
 from tortoise.contrib.fastapi import register_tortoise
 from config import Settings
+from tasks.elastic_sync import dispatch_search_outbox
+from tasks.hot_score import dispatch_hot_scores
 from tasks.project_sync import sync_projects
+from tasks.view_counter import view_counter
 from utils.database import TORTOISE_ORM
 from api.router import router
+from services.suggest_service import SuggestService
 from core import register_exception_handlers
 import uvicorn
 
@@ -27,10 +31,24 @@ async def lifespan(app: FastAPI):
   async_connections.create_connection(
       hosts=Settings.ELASTIC_URL, api_key=Settings.ELASTIC_APIKEY
   )
+  await SuggestService.load()
   sync_task = asyncio.create_task(sync_projects(
       interval=Settings.SYNC_INTERVAL, frequency=Settings.SYNC_FREQUENCY))
+  outbox_task = asyncio.create_task(dispatch_search_outbox(
+      interval=Settings.SEARCH_OUTBOX_INTERVAL,
+      batch_size=Settings.SEARCH_OUTBOX_BATCH_SIZE))
+  view_task = asyncio.create_task(
+      view_counter.run(interval=Settings.VIEW_COUNT_FLUSH_INTERVAL))
+  hot_task = asyncio.create_task(
+      dispatch_hot_scores(interval=Settings.HOT_SCORE_INTERVAL))
   yield
   sync_task.cancel()
+  outbox_task.cancel()
+  view_task.cancel()
+  hot_task.cancel()
+  # 等待进行中的写入回滚并放回数据，再写入剩余的浏览量
+  await asyncio.gather(view_task, return_exceptions=True)
+  await view_counter.flush()
 
 app = FastAPI(
     title="开源项目展示平台API",
@@ -1,4 +1,4 @@
-from elasticsearch.dsl import Text, Keyword, Integer, Boolean, Completion, analyzer, token_filter, AsyncDocument
+from elasticsearch.dsl import Text, Keyword, Integer, Boolean, Completion, RankFeature, analyzer, token_filter, AsyncDocument
 
 my_pinyin = token_filter(
     'my_pinyin', type='pinyin', keep_full_pinyin=False,
@@ -22,6 +22,8 @@ class Project(AsyncDocument):
   platform = Keyword()
   is_featured = Boolean()
   tags = Integer()
+  # rank_feature 只接受正数，热度为 0 时不写入
+  hot_score = RankFeature()
 
   class Index:
     name = 'projects'
@@ -14,6 +14,10 @@ class CreateUpdateTimeMixin:
   updated_at = fields.DatetimeField(auto_now=True)
 
 
+def empty_rating_histogram() -> list[int]:
+  return [0] * 11
+
+
 class Role(str, Enum):
   USER = "user"
   ADMIN = "admin"
@@ -24,6 +28,11 @@ class Platform(str, Enum):
   GITEE = "Gitee"
 
 
+class SearchOutboxAction(str, Enum):
+  INDEX = "index"
+  DELETE = "delete"
+
+
 class User(CreateTimeMixin, Model):
   """用户实体类"""
 
@@ -77,6 +86,14 @@ class Project(CreateTimeMixin, Model):
   last_commit_at = fields.DatetimeField(null=True)
   average_rating = fields.FloatField(default=0)
   rating_count = fields.IntField(default=0)
+  # 评分总和，与 rating_count 一起原子地维护 average_rating
+  rating_sum = fields.IntField(default=0)
+  # 贝叶斯加权评分，用于按评分排序，新建项目时为先验均值
+  weighted_rating = fields.FloatField(default=0)
+  # 热度，由 tasks.hot_score 定期重新计算
+  hot_score = fields.FloatField(default=0)
+  # 各分数（0-10）的评分数
+  rating_histogram = fields.JSONField(default=empty_rating_histogram)
   repo_created_at = fields.DatetimeField(null=True)
   last_sync_at = fields.DatetimeField(null=True)
   platform = fields.CharEnumField(Platform)
@@ -102,16 +119,22 @@ class Project(CreateTimeMixin, Model):
   related_notifications: fields.ReverseRelation["Notification"]
   sync_logs: fields.ReverseRelation["SyncLog"]
   images: fields.ReverseRelation["Image"]
+  related_links: fields.ReverseRelation["ProjectRelation"]
+  related_from: fields.ReverseRelation["ProjectRelation"]
+  visitor_sketches: fields.ReverseRelation["ProjectVisitorSketch"]
 
   class Meta(Model.Meta):
     table = "projects"
+    # 排序字段与 id 组成联合索引，供游标分页使用
     indexes = (
-        "repo_id",
-        "programming_language",
-        "stars",
-        "last_commit_at",
-        "created_at",
-        "last_sync_at",
+        ("repo_id",),
+        ("programming_language",),
+        ("stars", "id"),
+        ("last_commit_at", "id"),
+        ("created_at", "id"),
+        ("weighted_rating", "id"),
+        ("hot_score", "id"),
+        ("last_sync_at",),
     )
 
 
@@ -149,7 +172,7 @@ class Rating(CreateUpdateTimeMixin, Model):
 
   class Meta(Model.Meta):
     table = "ratings"
-    indexes = ("project_id", "user_id")
+    indexes = (("project_id", "user_id"), ("updated_at",))
     unique_together = (("project_id", "user_id"),)
 
 
@@ -174,7 +197,7 @@ class Comment(CreateUpdateTimeMixin, Model):
 
   class Meta(Model.Meta):
     table = "comments"
-    indexes = ("project_id", "user_id", "parent_id")
+    indexes = (("project_id", "user_id", "parent_id"), ("created_at",))
 
 
 class Favorite(CreateTimeMixin, Model):
@@ -191,7 +214,7 @@ class Favorite(CreateTimeMixin, Model):
   class Meta(Model.Meta):
     table = "favorites"
     unique_together = (("project_id", "user_id"),)
-    indexes = ("project_id", "user_id")
+    indexes = (("project_id", "user_id"), ("created_at",))
 
 
 class Notification(CreateTimeMixin, Model):
@@ -236,6 +259,39 @@ class OAuthAccount(CreateUpdateTimeMixin, Model):
     indexes = ("user_id",)
 
 
+class ProjectRelation(Model):
+  """相似项目，按标签 Jaccard 相似度预先计算的前 K 个"""
+
+  id = fields.IntField(pk=True)
+  project: fields.ForeignKeyRelation["Project"] = fields.ForeignKeyField(
+      "models.Project", related_name="related_links"
+  )
+  related: fields.ForeignKeyRelation["Project"] = fields.ForeignKeyField(
+      "models.Project", related_name="related_from"
+  )
+  score = fields.FloatField()
+
+  class Meta(Model.Meta):
+    table = "project_relations"
+    indexes = (("project_id", "score"),)
+    unique_together = (("project_id", "related_id"),)
+
+
+class ProjectVisitorSketch(Model):
+  """项目每日独立访客的 HyperLogLog 草图"""
+
+  id = fields.IntField(pk=True)
+  project: fields.ForeignKeyRelation["Project"] = fields.ForeignKeyField(
+      "models.Project", related_name="visitor_sketches"
+  )
+  day = fields.DateField()
+  sketch = fields.BinaryField()
+
+  class Meta(Model.Meta):
+    table = "project_visitor_sketches"
+    unique_together = (("project_id", "day"),)
+
+
 class SyncLog(CreateTimeMixin, Model):
   """同步日志实体类"""
 
@@ -248,7 +304,7 @@ class SyncLog(CreateTimeMixin, Model):
 
   class Meta(Model.Meta):
     table = "sync_logs"
-    indexes = ("project_id",)
+    indexes = (("project_id",), ("created_at",))
 
 
 class Image(CreateTimeMixin, Model):
@@ -268,3 +324,34 @@ class Image(CreateTimeMixin, Model):
   class Meta(Model.Meta):
     table = "images"
     indexes = ("project_id", "user_id", "uuid")
+
+
+class HttpValidator(Model):
+  """第三方 API 条件请求的校验信息及上次的响应内容"""
+
+  id = fields.IntField(pk=True)
+  url = fields.CharField(max_length=512, unique=True)
+  etag = fields.CharField(max_length=255, null=True)
+  last_modified = fields.CharField(max_length=64, null=True)
+  payload = fields.JSONField()
+  updated_at = fields.DatetimeField(auto_now=True)
+
+  class Meta(Model.Meta):
+    table = "http_validators"
+
+
+class SearchOutbox(CreateTimeMixin, Model):
+  """搜索索引同步发件箱，与业务数据在同一事务中写入"""
+
+  id = fields.IntField(pk=True)
+  # 项目可能已被删除，不使用外键
+  project_id = fields.IntField()
+  action = fields.CharEnumField(SearchOutboxAction)
+  attempts = fields.IntField(default=0)
+  # 为空表示可立即处理
+  next_attempt_at = fields.DatetimeField(null=True)
+  last_error = fields.TextField(null=True)
+
+  class Meta(Model.Meta):
+    table = "search_outbox"
+    indexes = ("next_attempt_at",)
@@ -1,4 +1,4 @@
-from typing import Generic, Literal, TypeVar, List
+from typing import Generic, Literal, Optional, TypeVar, List
 
 from fastapi import Query
 from pydantic import BaseModel
@@ -53,12 +53,34 @@ class PaginatedData(BaseModel, Generic[T]):
 
   items: List[T]
   total: int
+  # 为 False 时 total 为查询计划的估计值
+  total_exact: bool = True
   page: int
   page_size: int
   pages: int
+  # 游标分页时下一页的游标，为 None 表示没有下一页
+  next_cursor: Optional[str] = None
 
 
 class PaginatedResponse(ResponseBase, Generic[T]):
   """分页响应模型"""
 
   data: PaginatedData[T]
+
+
+class CursorPaginatedData(BaseModel, Generic[T]):
+  """游标分页数据模型"""
+
+  items: List[T]
+  page_size: int
+  # 为 None 表示没有下一页
+  next_cursor: Optional[str] = None
+  total: Optional[int] = None
+  # eq: total 为精确值; gte: total 为下限
+  total_relation: Literal["eq", "gte"] = "eq"
+
+
+class CursorPaginatedResponse(ResponseBase, Generic[T]):
+  """游标分页响应模型"""
+
+  data: CursorPaginatedData[T]
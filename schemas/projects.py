@@ -1,10 +1,11 @@
 from datetime import datetime
-from typing import Literal, Optional
+from typing import Generic, Literal, Optional
+from fastapi import Query
 from pydantic import Field, HttpUrl
 from pydantic.main import BaseModel
 
 from models.models import Platform
-from schemas.common import Order, PaginationParams
+from schemas.common import CursorPaginatedData, Order, PaginationParams, ResponseBase, T
 from schemas.images import ImageResponse
 from schemas.tags import TagResponse
 from schemas.users import UserResponse
@@ -56,6 +57,8 @@ class ProjectBaseResponse(BaseModel):
   stars: int
   issues: int
   average_rating: float
+  weighted_rating: float = 0
+  hot_score: float = 0
   rating_count: int
   view_count: int
   is_approved: Optional[bool]
@@ -109,6 +112,8 @@ ProjectOrderFields = Literal[
   "contributors",
   "issues",
   "average_rating",
+  "weighted_rating",
+  "hot_score",
   "rating_count",
   "created_at",
   "updated_at",
@@ -132,10 +137,19 @@ ProjectOrderFields = Literal[
 ]
 
 
+# 有联合索引 (字段, id)，支持游标分页的排序字段
+ProjectKeysetOrderFields = Literal[
+  "id", "stars", "created_at", "last_commit_at", "weighted_rating", "hot_score"
+]
+
+
 class ProjectPaginationParams(PaginationParams):
   order_by: Optional[ProjectOrderFields] = None
   order: Order = "desc"
   ids: Optional[list[int]] = None
+  # 游标分页：忽略 page，按 cursor 定位，深度翻页耗时不变
+  keyset: bool = False
+  cursor: Optional[str] = None
 
 
 class ProjectSearchParams(BaseModel):
@@ -148,6 +162,34 @@ class ProjectSearchParams(BaseModel):
   tags: list[int] = []
 
 
+class ProjectSearchPageParams(ProjectSearchParams):
+  page_size: int = Query(20, ge=1, le=100)
+  # 上一页返回的 next_cursor，为空时从第一页开始
+  cursor: Optional[str] = None
+  # 是否同时返回各筛选字段的分面计数
+  facets: bool = False
+
+
+class ProjectSearchFacetBucket(BaseModel):
+  key: str
+  count: int
+
+
+ProjectSearchFacets = dict[str, list[ProjectSearchFacetBucket]]
+
+
+class ProjectSearchPageData(CursorPaginatedData[T], Generic[T]):
+  """项目搜索分页数据模型"""
+
+  facets: Optional[ProjectSearchFacets] = None
+
+
+class ProjectSearchPageResponse(ResponseBase, Generic[T]):
+  """项目搜索分页响应模型"""
+
+  data: ProjectSearchPageData[T]
+
+
 class ProjectRepoDetail(BaseModel):
   repo_url: str
   # GitHub: avatar_url
@@ -1,110 +1,406 @@
-from elasticsearch.dsl import AsyncSearch
-from elasticsearch.dsl.query import Bool, Exists, MultiMatch, Term, TermsSet
-from core.exceptions import ResourceNotFoundError, ResourceExistsError
-from models.models import Comment, Favorite, Image, Platform, Project, Rating, Tag, User
+import json
+from collections import Counter
+from datetime import timedelta
+from typing import Optional, get_args
+from elasticsearch.dsl import AsyncSearch, async_connections
+from elasticsearch.dsl.query import (
+  Bool,
+  Exists,
+  MatchAll,
+  MultiMatch,
+  Query,
+  RankFeature,
+  Term,
+  TermsSet,
+)
+from elasticsearch import ApiError, TransportError
+from elasticsearch.exceptions import BadRequestError, NotFoundError
+from config import Settings
+from core.exceptions import ResourceNotFoundError, ResourceExistsError, ValidationError
+from models.models import (
+  Comment,
+  Favorite,
+  Image,
+  Platform,
+  Project,
+  ProjectRelation,
+  ProjectVisitorSketch,
+  Rating,
+  SearchOutboxAction,
+  Tag,
+  User,
+)
 from schemas.comments import CommentCreate
-from schemas.common import PaginatedData
+from schemas.common import DataResponse, PaginatedData
 from schemas.projects import (
   ProjectAdminUpdate,
   ProjectCreateModel,
+  ProjectFullResponse,
+  ProjectKeysetOrderFields,
   ProjectOwnerUpdate,
   ProjectPaginationParams,
   ProjectRepoDetail,
+  ProjectSearchFacetBucket,
+  ProjectSearchFacets,
+  ProjectSearchPageData,
+  ProjectSearchPageParams,
   ProjectSearchParams,
 )
 from schemas.ratings import RatingDistributionResponse, RatingUserResponse
 from schemas.users import UserRelatedResponse
 from services.notification_service import NotificationService
+from services.related_service import RelatedService
+from services.suggest_service import SuggestService
 from services.user_service import UserService
-from utils.database import pagination_query
+from tasks.elastic_sync import enqueue_project_sync
+from tasks.view_counter import view_counter
+from utils.cache import TTLCache
+from utils.cursor import decode_cursor, encode_cursor
+from utils.database import (
+  invalidate_count_cache,
+  keyset_pagination_query,
+  pagination_query,
+)
 from utils.gitee_api import GiteeAPI
+from utils.gitee_api import parse_contributor_count as gitee_contributor_count
 from utils.github_api import GitHubAPI
+from utils.github_api import parse_contributor_count as github_contributor_count
+from utils.http_cache import make_etag
+from utils.hyperloglog import HyperLogLog
+from utils.single_flight import single_flight
 from utils.time import now
-from tortoise.transactions import atomic
-from tortoise.expressions import F
+from tortoise import connections
+from tortoise.transactions import in_transaction
 from tortoise.query_utils import Prefetch
 from tortoise.exceptions import IntegrityError
-from tortoise.functions import Count
+
+SEARCH_FACET_FIELDS = (
+  "programming_language",
+  "license",
+  "platform",
+  "is_featured",
+  "tags",
+)
+
+# 按规范化后的查询条件缓存分面计数
+search_facet_cache: TTLCache[str, ProjectSearchFacets] = TTLCache(
+  maxsize=Settings.SEARCH_FACET_CACHE_SIZE, ttl=Settings.SEARCH_FACET_CACHE_TTL
+)
+
+# 项目详情缓存，值为 (ETag, 序列化后的 DataResponse[ProjectFullResponse])
+project_detail_cache: TTLCache[int, tuple[str, bytes]] = TTLCache(
+  maxsize=Settings.PROJECT_DETAIL_CACHE_SIZE, ttl=Settings.PROJECT_DETAIL_CACHE_TTL
+)
+# 每次失效递增，读取期间发生过失效的结果不写入缓存
+project_detail_generations: Counter[int] = Counter()
+
+
+GLOBAL_MEAN_RATING_SQL = """
+SELECT sum(rating_sum)::float / NULLIF(sum(rating_count), 0) AS mean FROM projects
+"""
+
+# 全站平均分变化缓慢，缓存后供评分写入和新建项目使用，全量同步评分时刷新
+rating_prior_cache: TTLCache[str, float] = TTLCache(
+  maxsize=1, ttl=Settings.RATING_PRIOR_TTL
+)
+
+# 索引中 hot_score 是否为 rank_feature；重建索引前的旧映射不支持 rank_feature 查询
+hot_score_mapping_cache: TTLCache[str, bool] = TTLCache(
+  maxsize=1, ttl=Settings.HOT_SCORE_MAPPING_TTL
+)
 
 
 class ProjectService:
   @staticmethod
-  async def search_projects(params: ProjectSearchParams) -> list[int]:
-    search = AsyncSearch(index="projects")
+  async def get_rating_prior() -> tuple[float, float]:
+    """贝叶斯平均的先验 (权重 m, 全站平均分 C)
+
+    weighted_rating = (评分总和 + m * C) / (评分数 + m)，评分少的项目向全站平均收缩。
+    """
+    mean = rating_prior_cache.get("mean")
+    if mean is None:
+      rows = await connections.get("default").execute_query_dict(
+        GLOBAL_MEAN_RATING_SQL
+      )
+      mean = rows[0]["mean"]
+      if mean is None:
+        mean = Settings.RATING_PRIOR_MEAN
+      rating_prior_cache.set("mean", mean)
+    return Settings.RATING_PRIOR_WEIGHT, mean
+
+  @staticmethod
+  def _search_filters(params: ProjectSearchParams) -> dict[str, Query]:
+    filters: dict[str, Query] = {}
     if params.programming_language:
       if params.programming_language == "Other":
-        search = search.filter(Bool(must_not=Exists(field="programming_language")))
+        filters["programming_language"] = Bool(
+          must_not=Exists(field="programming_language")
+        )
       else:
-        search = search.filter(Term(programming_language=params.programming_language))
+        filters["programming_language"] = Term(
+          programming_language=params.programming_language
+        )
     if params.license:
-      search = search.filter(Term(license=params.license))
+      filters["license"] = Term(license=params.license)
     if params.platform:
-      search = search.filter(Term(platform=params.platform))
+      filters["platform"] = Term(platform=params.platform)
     if params.is_featured is not None:
-      search = search.filter(Term(is_featured=params.is_featured))
+      filters["is_featured"] = Term(is_featured=params.is_featured)
     if (tags_len := len(params.tags)) > 0:
-      search = search.filter(
-        TermsSet(tags={"terms": params.tags, "minimum_should_match": tags_len})
+      filters["tags"] = TermsSet(
+        tags={"terms": params.tags, "minimum_should_match": tags_len}
       )
+    return filters
+
+  @staticmethod
+  async def _hot_score_ranked() -> bool:
+    ranked = hot_score_mapping_cache.get("projects")
+    if ranked is None:
+      mappings = await async_connections.get_connection().indices.get_field_mapping(
+        index="projects", fields="hot_score"
+      )
+      ranked = any(
+        field.get("mapping", {}).get("hot_score", {}).get("type") == "rank_feature"
+        for index in mappings.body.values()
+        for field in index["mappings"].values()
+      )
+      hot_score_mapping_cache.set("projects", ranked)
+    return ranked
+
+  @staticmethod
+  def _build_search(
+    params: ProjectSearchParams, post_filter: bool = False, hot_score: bool = False
+  ) -> AsyncSearch:
+    search = AsyncSearch(index="projects")
+    filters = ProjectService._search_filters(params)
+    if post_filter:
+      # 过滤条件放到 post_filter，聚合不受其影响
+      if filters:
+        search = search.post_filter(Bool(filter=list(filters.values())))
+    else:
+      for query in filters.values():
+        search = search.filter(query)
     if params.keyword:
-      search = search.query(
-        MultiMatch(query=params.keyword, fields=["name^5", "brief^3", "description^1"])
+      must: Query = MultiMatch(
+        query=params.keyword, fields=["name^5", "brief^3", "description^1"]
+      )
+    else:
+      must = MatchAll()
+    if not hot_score:
+      return search.query(must)
+    # 热度作为排序特征参与打分
+    search = search.query(
+      Bool(
+        must=[must],
+        should=[
+          RankFeature(field="hot_score", boost=Settings.HOT_SCORE_SEARCH_BOOST)
+        ],
+      )
+    )
+    return search
+
+  @staticmethod
+  def _add_facet_aggs(search: AsyncSearch, params: ProjectSearchParams) -> AsyncSearch:
+    # 每个分面的计数只应用其他字段的过滤条件，忽略自身的选择
+    filters = ProjectService._search_filters(params)
+    for field in SEARCH_FACET_FIELDS:
+      others = [query for name, query in filters.items() if name != field]
+      terms: dict = {"field": field, "size": Settings.SEARCH_FACET_SIZE}
+      if field == "programming_language":
+        terms["missing"] = "Other"
+      search.aggs.bucket(field, "filter", filter=Bool(filter=others)).bucket(
+        "values", "terms", **terms
       )
-    result = search.source(fields=False)
+    return search
+
+  @staticmethod
+  def _facet_cache_key(params: ProjectSearchParams) -> str:
+    return json.dumps(
+      {
+        "keyword": (params.keyword or "").strip().lower(),
+        "programming_language": params.programming_language,
+        "license": params.license,
+        "platform": params.platform,
+        "is_featured": params.is_featured,
+        "tags": sorted(set(params.tags)),
+      },
+      sort_keys=True,
+    )
+
+  @staticmethod
+  async def search_projects(params: ProjectSearchParams) -> list[int]:
+    hot_score = await ProjectService._hot_score_ranked()
+    result = ProjectService._build_search(params, hot_score=hot_score).source(
+      fields=False
+    )
     result_ids = []
     async for hit in result:
       result_ids.append(int(hit.meta.id))
     return result_ids
 
   @staticmethod
-  async def get_related_projects(project_id: int):
-    project = await ProjectService.get_project(project_id)
-    search = AsyncSearch(index="projects")
-    if (tags_len := len(project.tags)) > 0:
-      search = search.filter(
-        TermsSet(
-          tags={
-            "terms": [tag.id for tag in project.tags],
-            "minimum_should_match": int((tags_len + 1) / 2),
-          }
-        )
+  async def search_project_ids_page(
+    params: ProjectSearchPageParams,
+  ) -> ProjectSearchPageData[int]:
+    # point-in-time + search_after，任意深度的分页代价与第一页相同。
+    # 多数请求只看第一页，第一页不打开 PIT，请求下一页时才打开，避免 PIT 堆积
+    es = async_connections.get_connection()
+    keep_alive = Settings.SEARCH_PIT_KEEP_ALIVE
+    pit_id, search_after, offset = None, None, 0
+    if params.cursor:
+      cursor = decode_cursor(params.cursor)
+      if "pit" in cursor:
+        pit_id, search_after = cursor.get("pit"), cursor.get("after")
+        if not isinstance(pit_id, str) or not isinstance(search_after, list):
+          raise ValidationError(message="无效的分页游标")
+      else:
+        # 第一页返回的游标只记录偏移，第二页在新打开的 PIT 上按偏移读取
+        offset = cursor.get("offset")
+        if not isinstance(offset, int) or offset <= 0:
+          raise ValidationError(message="无效的分页游标")
+        pit = await es.open_point_in_time(index="projects", keep_alive=keep_alive)
+        pit_id = pit["id"]
+    facets = None
+    facet_key = ProjectService._facet_cache_key(params)
+    if params.facets:
+      facets = search_facet_cache.get(facet_key)
+    with_aggs = params.facets and facets is None
+    search = ProjectService._build_search(
+      params,
+      post_filter=with_aggs,
+      hot_score=await ProjectService._hot_score_ranked(),
+    ).source(fields=False)
+    if pit_id is None:
+      search = search.sort("_score")
+    else:
+      search = (
+        search.index()
+        .extra(pit={"id": pit_id, "keep_alive": keep_alive})
+        .sort("_score", {"_shard_doc": "asc"})
       )
-      result = search.source(fields=False)
-      result_ids = []
-      async for hit in result:
-        result_ids.append(int(hit.meta.id))
-      result_ids.remove(project_id)
-      query = Project.filter(id__in=result_ids).prefetch_related("tags")
-      unsorted_results = await query
-      project_map = {project.id: project for project in unsorted_results}
-      results = []
-      for project_id in result_ids:
-        if project_id not in project_map:
-          continue
-        results.append(project_map[project_id])
-      return results
-    return []
-
-  @staticmethod
-  async def suggest_projects(keyword: str) -> list[str]:
-    return await ProjectService.suggest_projects_through_db(keyword)
-
-  @staticmethod
-  async def suggest_projects_through_es(keyword: str) -> list[str]:
+    if search_after is not None:
+      search = search.extra(search_after=search_after)
+    search = search[offset : offset + params.page_size]
+    if with_aggs:
+      search = ProjectService._add_facet_aggs(search, params)
+    try:
+      result = await search.execute()
+    except NotFoundError:
+      raise ValidationError(message="分页游标已过期")
+    except BadRequestError:
+      # 被篡改的 after 或 PIT id 由 Elasticsearch 以 400 拒绝
+      if search_after is not None:
+        raise ValidationError(message="无效的分页游标")
+      if offset:
+        await es.close_point_in_time(id=pit_id)
+      raise
+    except Exception:
+      if offset:
+        # 本次打开的 PIT 不会再被使用
+        await es.close_point_in_time(id=pit_id)
+      raise
+    if with_aggs:
+      aggregations = result.aggregations.to_dict()
+      facets = {
+        field: [
+          ProjectSearchFacetBucket(
+            key=str(bucket.get("key_as_string", bucket["key"])),
+            count=bucket["doc_count"],
+          )
+          for bucket in aggregations[field]["values"]["buckets"]
+        ]
+        for field in SEARCH_FACET_FIELDS
+      }
+      search_facet_cache.set(facet_key, facets)
+    next_cursor = None
+    if pit_id is None:
+      if len(result.hits) == params.page_size:
+        next_cursor = encode_cursor({"offset": params.page_size})
+    else:
+      pit_id = result.to_dict().get("pit_id", pit_id)
+      if len(result.hits) == params.page_size:
+        next_cursor = encode_cursor(
+          {"pit": pit_id, "after": list(result.hits[-1].meta.sort)}
+        )
+      else:
+        await es.close_point_in_time(id=pit_id)
+    return ProjectSearchPageData[int](
+      items=[int(hit.meta.id) for hit in result.hits],
+      page_size=params.page_size,
+      next_cursor=next_cursor,
+      total=result.hits.total.value,  # pyright: ignore
+      total_relation=result.hits.total.relation,  # pyright: ignore
+      facets=facets,
+    )
+
+  @staticmethod
+  async def get_related_projects(project_id: int) -> list[Project]:
+    relations = (
+      await ProjectRelation.filter(project_id=project_id)
+      .order_by("-score", "related_id")
+      .prefetch_related("related__tags")
+    )
+    if not relations and not await Project.filter(id=project_id).exists():
+      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    return [relation.related for relation in relations]
+
+  @staticmethod
+  async def _hydrate_projects(ids: list[int]) -> list[Project]:
+    # 一次查询取回项目及标签，并保持 ids 的顺序（ES 相关性顺序）
+    if not ids:
+      return []
+    projects = await Project.filter(id__in=ids).prefetch_related("tags")
+    project_map = {project.id: project for project in projects}
+    return [project_map[project_id] for project_id in ids if project_id in project_map]
+
+  @staticmethod
+  async def search_projects_page(
+    params: ProjectSearchPageParams,
+  ) -> ProjectSearchPageData:
+    page = await ProjectService.search_project_ids_page(params)
+    projects = await ProjectService._hydrate_projects(page.items)
+    return ProjectSearchPageData(
+      items=projects,
+      page_size=page.page_size,
+      next_cursor=page.next_cursor,
+      total=page.total,
+      total_relation=page.total_relation,
+      facets=page.facets,
+    )
+
+  @staticmethod
+  async def suggest_projects(
+    keyword: str, limit: int = Settings.SUGGEST_LIMIT
+  ) -> list[str]:
+    return SuggestService.suggest(keyword, limit)
+
+  @staticmethod
+  async def suggest_projects_through_es(
+    keyword: str, limit: int = Settings.SUGGEST_LIMIT
+  ) -> list[str]:
     if keyword == "":
-      return await ProjectService.suggest_projects_through_db("")
+      return await ProjectService.suggest_projects_through_db("", limit)
     search = AsyncSearch(index="projects")
     search = search.suggest(
-      "name", keyword, completion={"field": "name.suggest"}
+      "name", keyword, completion={"field": "name.suggest", "size": limit}
     ).source(fields=False)[0:10]
-    result = await search.execute()
+    try:
+      result = await search.execute()
+    except (ApiError, TransportError):
+      # ES 不可用时使用本地联想索引
+      return SuggestService.suggest(keyword, limit)
     # pyright: ignore
     return [item.text for item in result.suggest.name[0].options]
 
   @staticmethod
-  async def suggest_projects_through_db(keyword: str) -> list[str]:
-    projects = await Project.filter(name__istartswith=keyword).values_list(
-      "name", flat=True
+  async def suggest_projects_through_db(
+    keyword: str, limit: int = Settings.SUGGEST_LIMIT
+  ) -> list[str]:
+    projects = (
+      await Project.filter(name__istartswith=keyword)
+      .order_by(f"-{Settings.SUGGEST_RANK_FIELD}", "id")
+      .limit(limit)
+      .values_list("name", flat=True)
     )
     return projects  # pyright: ignore
 
@@ -112,6 +408,16 @@ class ProjectService:
   async def get_projects(
     params: ProjectPaginationParams,
   ) -> PaginatedData:
+    if params.keyset:
+      order_by = params.order_by or "id"
+      if order_by not in get_args(ProjectKeysetOrderFields):
+        raise ValidationError(message=f"排序字段 {order_by} 不支持游标分页")
+      query = Project.all().prefetch_related("tags")
+      if params.ids:
+        query = query.filter(id__in=params.ids)
+      return await keyset_pagination_query(
+        params, query, order_by, params.order, params.cursor
+      )
     order = params.order_by
     query = Project.all().prefetch_related("tags")
     if params.order == "desc" and order:
@@ -126,14 +432,7 @@ class ProjectService:
           (params.page - 1) * params.page_size : params.page * params.page_size
           + params.page_size
         ]
-        query = Project.filter(id__in=id_list).prefetch_related("tags")
-        unsorted_results = await query
-        project_map = {project.id: project for project in unsorted_results}
-        results = []
-        for project_id in id_list:
-          if project_id not in project_map:
-            continue
-          results.append(project_map[project_id])
+        results = await ProjectService._hydrate_projects(id_list)
         return PaginatedData(
           items=results,
           total=len(results),
@@ -176,6 +475,32 @@ class ProjectService:
       raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
     return result
 
+  @staticmethod
+  @single_flight(timeout=Settings.SINGLE_FLIGHT_TIMEOUT)
+  async def get_project_detail(project_id: int) -> tuple[str, bytes]:
+    """序列化后的项目详情响应及其 ETag，优先读取缓存"""
+    entry = project_detail_cache.get(project_id)
+    if entry is None:
+      generation = project_detail_generations[project_id]
+      project = await ProjectService.get_project(project_id)
+      content = (
+        DataResponse[ProjectFullResponse]
+        .model_validate({"data": project}, from_attributes=True)
+        .model_dump_json()
+        .encode()
+      )
+      entry = (make_etag(content), content)
+      if project_detail_generations[project_id] == generation:
+        project_detail_cache.set(project_id, entry)
+    return entry
+
+  @staticmethod
+  def invalidate_project_detail(*project_ids: int):
+    for project_id in project_ids:
+      project_detail_generations[project_id] += 1
+      project_detail_cache.invalidate(project_id)
+      ProjectService.get_project_detail.forget(project_id)  # pyright: ignore
+
   @staticmethod
   async def get_project_shallow(project_id: int) -> Project:
     result = await Project.get_or_none(id=project_id)
@@ -194,10 +519,47 @@ class ProjectService:
     elif platform == Platform.GITEE:
       return await ProjectService.get_gitee_repo_detail(repo_id)
 
+  @staticmethod
+  def repo_validator_keys(
+    platform: Platform, repo_id: str, contributors_only: bool = False
+  ) -> list[str]:
+    """get_repo_detail_if_modified 的条件请求保存校验信息使用的 URL，用于批量预读"""
+    api = GitHubAPI if platform == Platform.GITHUB else GiteeAPI
+    keys = [api.validator_key(f"/repos/{repo_id}/contributors", {"per_page": 1})]
+    if not contributors_only:
+      keys.append(api.validator_key(f"/repos/{repo_id}"))
+    return keys
+
+  @staticmethod
+  async def get_repo_detail_if_modified(
+    platform: Platform, repo_id: str
+  ) -> Optional[ProjectRepoDetail]:
+    """使用条件请求获取仓库信息，仓库与贡献者均未变化时返回 None"""
+    if platform == Platform.GITHUB:
+      api, contributor_count = GitHubAPI, github_contributor_count
+    else:
+      api, contributor_count = GiteeAPI, gitee_contributor_count
+    repo = await api.get_conditional(f"/repos/{repo_id}")
+    # 只请求一条贡献者记录，由分页信息得到总数，保存的也只是总数
+    contributors = await api.get_conditional(
+      f"/repos/{repo_id}/contributors",
+      params={"per_page": 1},
+      parse=contributor_count,
+    )
+    if not repo.modified and not contributors.modified:
+      return None
+    if platform == Platform.GITHUB:
+      return ProjectService._github_repo_detail(repo.data, contributors.data)
+    return ProjectService._gitee_repo_detail(repo.data, contributors.data)
+
   @staticmethod
   async def get_github_repo_detail(repo_id: str):
     repo_detail = await GitHubAPI.get_repo_detail(repo_id)
-    contributors = await GitHubAPI.get_repo_contributors(repo_id)
+    contributors = await GitHubAPI.get_repo_contributor_count(repo_id)
+    return ProjectService._github_repo_detail(repo_detail, contributors)
+
+  @staticmethod
+  def _github_repo_detail(repo_detail: dict, contributors: int) -> ProjectRepoDetail:
     return ProjectRepoDetail(
       avatar=repo_detail.get("avatar_url", repo_detail["owner"]["avatar_url"]),
       name=repo_detail["name"],
@@ -206,7 +568,7 @@ class ProjectService:
       stars=repo_detail["stargazers_count"],
       forks=repo_detail["forks_count"],
       watchers=repo_detail["subscribers_count"],
-      contributors=len(contributors),
+      contributors=contributors,
       issues=repo_detail["open_issues_count"],
       license=repo_detail["license"]["spdx_id"] if repo_detail["license"] else None,
       programming_language=repo_detail["language"],
@@ -216,10 +578,50 @@ class ProjectService:
       last_sync_at=now(),
     )
 
+  @staticmethod
+  async def get_github_graphql_repo_detail(
+    repo_id: str, repo: Optional[dict]
+  ) -> ProjectRepoDetail:
+    """由批量 GraphQL 查询的结果补全贡献者数，repo 为 None 表示仓库不存在"""
+    if repo is None:
+      raise ResourceNotFoundError(resource=f"GitHub 仓库 {repo_id}")
+    contributors = await GitHubAPI.get_conditional(
+      f"/repos/{repo_id}/contributors",
+      params={"per_page": 1},
+      parse=github_contributor_count,
+    )
+    return ProjectService._github_graphql_repo_detail(repo, contributors.data)
+
+  @staticmethod
+  def _github_graphql_repo_detail(repo: dict, contributors: int) -> ProjectRepoDetail:
+    language = repo["primaryLanguage"]
+    return ProjectRepoDetail(
+      avatar=repo["owner"]["avatarUrl"],
+      name=repo["name"],
+      repo_url=f"https://github.com/{repo['nameWithOwner']}",
+      website_url=repo["homepageUrl"],
+      stars=repo["stargazerCount"],
+      forks=repo["forkCount"],
+      watchers=repo["watchers"]["totalCount"],
+      contributors=contributors,
+      # 与 REST 的 open_issues_count 一致，包含未关闭的 PR
+      issues=repo["issues"]["totalCount"] + repo["pullRequests"]["totalCount"],
+      license=repo["licenseInfo"]["spdxId"] if repo["licenseInfo"] else None,
+      programming_language=language["name"] if language else None,
+      last_commit_at=repo["pushedAt"],
+      repo_created_at=repo["createdAt"],
+      owner_platform_id=repo["owner"]["databaseId"],
+      last_sync_at=now(),
+    )
+
   @staticmethod
   async def get_gitee_repo_detail(repo_id: str):
     repo_detail = await GiteeAPI.get_repo_detail(repo_id)
-    contributors = await GiteeAPI.get_repo_contributors(repo_id)
+    contributors = await GiteeAPI.get_repo_contributor_count(repo_id)
+    return ProjectService._gitee_repo_detail(repo_detail, contributors)
+
+  @staticmethod
+  def _gitee_repo_detail(repo_detail: dict, contributors: int) -> ProjectRepoDetail:
     return ProjectRepoDetail(
       avatar=repo_detail.get("avatar_url", repo_detail["owner"]["avatar_url"]),
       name=repo_detail["name"],
@@ -228,7 +630,7 @@ class ProjectService:
       stars=repo_detail["stargazers_count"],
       forks=repo_detail["forks_count"],
       watchers=repo_detail["watchers_count"],
-      contributors=len(contributors),
+      contributors=contributors,
       issues=repo_detail["open_issues_count"],
       license=repo_detail["license"],
       programming_language=repo_detail["language"],
@@ -239,6 +641,7 @@ class ProjectService:
     )
 
   @staticmethod
+  @single_flight(timeout=Settings.SINGLE_FLIGHT_TIMEOUT)
   async def get_project_comments(project_id: int) -> list[Comment]:
     return (
       await Comment.filter(project_id=project_id)
@@ -251,6 +654,7 @@ class ProjectService:
     )
 
   @staticmethod
+  @single_flight(timeout=Settings.SINGLE_FLIGHT_TIMEOUT)
   async def get_project_ratings(project_id: int):
     ratings = (
       await Rating.filter(project_id=project_id)
@@ -262,13 +666,18 @@ class ProjectService:
       .order_by("updated_at")
       .limit(5)
     )
-    grouped = (
-      await Rating.filter(project_id=project_id)
-      .annotate(count=Count("score"))
-      .group_by("score")
-      .values("score", "count")
+    histogram = (
+      await Project.filter(id=project_id)
+      .values_list("rating_histogram", flat=True)
+      .first()
     )
-    distribution = {item["score"]: item["count"] for item in grouped}
+    if histogram is None:
+      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    distribution = {
+      score: count
+      for score, count in enumerate(histogram)  # pyright: ignore
+      if count
+    }
     ratings = [
       RatingUserResponse(
         id=rating.id,
@@ -291,22 +700,28 @@ class ProjectService:
     return rating
 
   @staticmethod
-  @atomic()
   async def create_project(project_create: ProjectCreateModel):
     try:
-      project = await Project.create(
-        **project_create.model_dump(exclude=set(["tag_ids", "image_ids"])),
-        updated_at=now(),
-      )
-      tags = await Tag.filter(id__in=project_create.tag_ids)
-      await Image.filter(id__in=project_create.image_ids).update(project=project)
-      await project.tags.add(*tags)
-      await project.fetch_related("submitter", "tags", "images")
-      return project
+      async with in_transaction():
+        _, mean = await ProjectService.get_rating_prior()
+        project = await Project.create(
+          **project_create.model_dump(exclude=set(["tag_ids", "image_ids"])),
+          # 没有评分时贝叶斯平均即为先验均值，与全量同步后的未评分项目一致
+          weighted_rating=mean,
+          updated_at=now(),
+        )
+        tags = await Tag.filter(id__in=project_create.tag_ids)
+        await Image.filter(id__in=project_create.image_ids).update(project=project)
+        await project.tags.add(*tags)
+        await RelatedService.refresh_projects(project.id)
+        await project.fetch_related("submitter", "tags", "images")
+        await enqueue_project_sync(project.id)
     except IntegrityError:
       raise ResourceExistsError(message="项目已存在")
-    except Exception as e:
-      raise e
+    # 提交后再刷新，避免并发请求在提交前读到旧数据并重新缓存
+    await SuggestService.refresh_projects(project.id)
+    invalidate_count_cache(Project)
+    return project
 
   @staticmethod
   async def create_comment(
@@ -318,26 +733,31 @@ class ProjectService:
       **comment_create.model_dump(exclude_unset=True),
     )
     await comment.fetch_related("user")
+    ProjectService.get_project_comments.forget(project_id)  # pyright: ignore
     return comment
 
   @staticmethod
-  @atomic()
   async def update_project(
     project_id: int, project_update: ProjectOwnerUpdate | ProjectAdminUpdate
   ):
-    project = await Project.get_or_none(id=project_id)
-    if project is None:
-      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
-    update_dict = project_update.model_dump(
-      exclude=set(["tag_ids"]), exclude_unset=True
-    )
-    update_dict["updated_at"] = now()
-    await project.update_from_dict(update_dict).save()
-    if project_update.tag_ids is not None:
-      tags = await Tag.filter(id__in=project_update.tag_ids)
-      await project.tags.clear()
-      await project.tags.add(*tags)
-    await project.fetch_related("submitter", "tags", "images")
+    async with in_transaction():
+      project = await Project.get_or_none(id=project_id)
+      if project is None:
+        raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+      update_dict = project_update.model_dump(
+        exclude=set(["tag_ids"]), exclude_unset=True
+      )
+      update_dict["updated_at"] = now()
+      await project.update_from_dict(update_dict).save()
+      if project_update.tag_ids is not None:
+        tags = await Tag.filter(id__in=project_update.tag_ids)
+        await project.tags.clear()
+        await project.tags.add(*tags)
+        await RelatedService.refresh_projects(project.id)
+      await project.fetch_related("submitter", "tags", "images")
+      await enqueue_project_sync(project.id)
+    # 提交后再失效，避免并发请求在提交前读到旧数据并重新缓存
+    ProjectService.invalidate_project_detail(project.id)
     return project
 
   @staticmethod
@@ -347,6 +767,7 @@ class ProjectService:
     )
     if count == 0:
       raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    ProjectService.invalidate_project_detail(project_id)
     return await ProjectService.get_project(project_id)
 
   @staticmethod
@@ -354,27 +775,46 @@ class ProjectService:
     count = await Project.filter(id=project_id).update(is_approved=False)
     if count == 0:
       raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    ProjectService.invalidate_project_detail(project_id)
     return await ProjectService.get_project(project_id)
 
   @staticmethod
   async def feature_project(project_id: int):
-    count = await Project.filter(id=project_id).update(is_featured=True)
-    if count == 0:
-      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    async with in_transaction():
+      count = await Project.filter(id=project_id).update(is_featured=True)
+      if count == 0:
+        raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+      await enqueue_project_sync(project_id)
+    ProjectService.invalidate_project_detail(project_id)
     return await ProjectService.get_project(project_id)
 
   @staticmethod
   async def unfeature_project(project_id: int):
-    count = await Project.filter(id=project_id).update(is_featured=False)
-    if count == 0:
-      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    async with in_transaction():
+      count = await Project.filter(id=project_id).update(is_featured=False)
+      if count == 0:
+        raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+      await enqueue_project_sync(project_id)
+    ProjectService.invalidate_project_detail(project_id)
     return await ProjectService.get_project(project_id)
 
   @staticmethod
-  async def increase_view_count(project_id: int):
-    count = await Project.filter(id=project_id).update(view_count=F("view_count") + 1)
-    if count == 0:
-      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+  async def increase_view_count(project_id: int, visitor: Optional[str] = None):
+    # 浏览量和访客草图先在内存中累计，由 view_counter 批量写入
+    view_counter.increment(project_id, visitor)
+
+  @staticmethod
+  async def get_unique_visitors(project_id: int, days: int) -> int:
+    """最近 days 天（含今天）的独立访客数估计"""
+    since = now().date() - timedelta(days=days - 1)
+    sketch = HyperLogLog(Settings.VISITOR_SKETCH_PRECISION)
+    for stored in await ProjectVisitorSketch.filter(
+      project_id=project_id, day__gte=since
+    ).values_list("sketch", flat=True):
+      sketch.merge(HyperLogLog.from_bytes(stored, sketch.precision))  # pyright: ignore
+    for pending in view_counter.pending_sketches(project_id, since):
+      sketch.merge(pending)
+    return sketch.count()
 
   @staticmethod
   async def get_project_favorites(project_id: int):
@@ -404,6 +844,16 @@ class ProjectService:
 
   @staticmethod
   async def delete_project(project_id: int):
-    count = await Project.filter(id=project_id).delete()
-    if count == 0:
-      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    async with in_transaction():
+      # 删除会级联删除相似关系，需要事先记录引用该项目的项目
+      referrer_ids = await ProjectRelation.filter(
+        related_id=project_id
+      ).values_list("project_id", flat=True)
+      count = await Project.filter(id=project_id).delete()
+      if count == 0:
+        raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+      await RelatedService.recompute(*referrer_ids)  # pyright: ignore
+      await enqueue_project_sync(project_id, action=SearchOutboxAction.DELETE)
+    invalidate_count_cache(Project)
+    ProjectService.invalidate_project_detail(project_id)
+    SuggestService.remove_project(project_id)
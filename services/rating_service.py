@@ -1,31 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from tortoise import connections
+from config import Settings
 from models.models import Project, Rating
 from schemas.ratings import RatingCreate, RatingModifiedResponse, RatingUpdate
-from services.project_service import ProjectService
-from tortoise.transactions import atomic
+from services.project_service import ProjectService, rating_prior_cache
 from core.exceptions import ResourceConflictError, ResourceNotFoundError
 from tortoise.exceptions import IntegrityError
-from tortoise.functions import Avg, Count
+from utils.time import now
+
+# 评分写入与项目评分汇总在同一条语句中完成，SET 中的 p.* 均为更新前的值
+CREATE_RATING_SQL = """
+WITH inserted AS (
+  INSERT INTO ratings (project_id, user_id, score, is_used, created_at, updated_at)
+  VALUES ($1, $2, $3, $4, $5, $5)
+  ON CONFLICT (project_id, user_id) DO NOTHING
+  RETURNING project_id, score
+)
+UPDATE projects AS p SET
+  rating_count = p.rating_count + 1,
+  rating_sum = p.rating_sum + i.score,
+  average_rating = (p.rating_sum + i.score)::float / (p.rating_count + 1),
+  weighted_rating = (p.rating_sum + i.score + $6::float * $7::float)
+    / (p.rating_count + 1 + $6::float),
+  rating_histogram = jsonb_set(
+    p.rating_histogram,
+    ARRAY[i.score::text],
+    to_jsonb((p.rating_histogram->>i.score)::int + 1)
+  )
+FROM inserted AS i WHERE p.id = i.project_id
+RETURNING p.average_rating, p.rating_count
+"""
+
+UPDATE_RATING_SQL = """
+WITH updated AS (
+  UPDATE ratings AS r SET
+    score = COALESCE($3, r.score),
+    is_used = COALESCE($4, r.is_used),
+    updated_at = $5
+  FROM (
+    SELECT id, score FROM ratings WHERE project_id = $1 AND user_id = $2 FOR UPDATE
+  ) AS old
+  WHERE r.id = old.id
+  RETURNING r.project_id, old.score AS old_score, r.score
+)
+UPDATE projects AS p SET
+  rating_sum = p.rating_sum + u.score - u.old_score,
+  average_rating = (p.rating_sum + u.score - u.old_score)::float / p.rating_count,
+  weighted_rating = (p.rating_sum + u.score - u.old_score + $6::float * $7::float)
+    / (p.rating_count + $6::float),
+  rating_histogram = CASE
+    WHEN u.score = u.old_score THEN p.rating_histogram
+    ELSE jsonb_set(
+      jsonb_set(
+        p.rating_histogram,
+        ARRAY[u.old_score::text],
+        to_jsonb((p.rating_histogram->>u.old_score)::int - 1)
+      ),
+      ARRAY[u.score::text],
+      to_jsonb((p.rating_histogram->>u.score)::int + 1)
+    )
+  END
+FROM updated AS u WHERE p.id = u.project_id
+RETURNING p.average_rating, p.rating_count
+"""
+
+DELETE_RATING_SQL = """
+WITH deleted AS (
+  DELETE FROM ratings WHERE project_id = $1 AND user_id = $2
+  RETURNING project_id, score
+)
+UPDATE projects AS p SET
+  rating_count = p.rating_count - 1,
+  rating_sum = p.rating_sum - d.score,
+  average_rating = CASE
+    WHEN p.rating_count > 1
+    THEN (p.rating_sum - d.score)::float / (p.rating_count - 1)
+    ELSE 0
+  END,
+  weighted_rating = (p.rating_sum - d.score + $3::float * $4::float)
+    / (p.rating_count - 1 + $3::float),
+  rating_histogram = jsonb_set(
+    p.rating_histogram,
+    ARRAY[d.score::text],
+    to_jsonb((p.rating_histogram->>d.score)::int - 1)
+  )
+FROM deleted AS d WHERE p.id = d.project_id
+RETURNING p.average_rating, p.rating_count
+"""
+
+
+RECOMPUTE_RATINGS_SQL = """
+UPDATE projects AS p SET
+  rating_count = h.count,
+  rating_sum = h.total,
+  average_rating = CASE WHEN h.count > 0 THEN h.total::float / h.count ELSE 0 END,
+  weighted_rating = (h.total + $2::float * $3::float) / (h.count + $2::float),
+  rating_histogram = h.histogram
+FROM (
+  SELECT
+    v.id,
+    COALESCE(sum(b.n), 0) AS count,
+    COALESCE(sum(b.score * b.n), 0) AS total,
+    jsonb_agg(COALESCE(b.n, 0) ORDER BY s.score) AS histogram
+  FROM unnest($1::int[]) AS v(id)
+  CROSS JOIN generate_series(0, 10) AS s(score)
+  LEFT JOIN (
+    SELECT project_id, score, count(*) AS n FROM ratings
+    WHERE project_id = ANY($1::int[])
+    GROUP BY project_id, score
+  ) AS b ON b.project_id = v.id AND b.score = s.score
+  GROUP BY v.id
+) AS h
+WHERE p.id = h.id
+RETURNING p.id
+"""
 
 
 class RatingService:
+  # 上次同步开始的时间，增量同步只重新计算此后有评分变更的项目
+  _synced_at: Optional[datetime] = None
+  _sync_lock = asyncio.Lock()
+
   @staticmethod
-  async def sync_rating():
-    averages = (
-      await Rating.annotate(avg_score=Avg("score"), count=Count("score"))
-      .group_by("project_id")
-      .values("project_id", "avg_score", "count")
-    )
-    projects_to_update = []
-    for average in averages:
-      project_id = average["project_id"]
-      average_rating = average["avg_score"]
-      rating_count = average["count"]
-      projects_to_update.append(
-        Project(id=project_id, average_rating=average_rating, rating_count=rating_count)
-      )
-    await Project.bulk_update(
-      projects_to_update, fields=["average_rating", "rating_count"]
-    )
+  def is_syncing() -> bool:
+    return RatingService._sync_lock.locked()
+
+  @staticmethod
+  async def _iter_project_ids(
+    since: Optional[datetime], chunk_size: int
+  ) -> AsyncIterator[list[int]]:
+    last_id = 0
+    while True:
+      if since is None:
+        query = Project.filter(id__gt=last_id).order_by("id")
+        field = "id"
+      else:
+        query = (
+          Rating.filter(updated_at__gte=since, project_id__gt=last_id)
+          .order_by("project_id")
+          .distinct()
+        )
+        field = "project_id"
+      project_ids = await query.limit(chunk_size).values_list(field, flat=True)
+      if not project_ids:
+        return
+      yield project_ids  # pyright: ignore
+      last_id = project_ids[-1]
+
+  @staticmethod
+  async def sync_rating(
+    incremental: bool = False, chunk_size: int = Settings.RATING_SYNC_CHUNK_SIZE
+  ) -> int:
+    """按评分表重新计算项目的评分汇总，返回更新的项目数
+
+    全量模式按项目 ID 分块遍历所有项目，没有评分的项目会被重置；增量模式只处理
+    上次同步以来有评分新增或修改的项目（删除由写入路径原子维护），首次运行时退化为全量。
+    """
+    async with RatingService._sync_lock:
+      started_at = now()
+      if not incremental:
+        rating_prior_cache.clear()
+      prior = await ProjectService.get_rating_prior()
+      since = None
+      if incremental and RatingService._synced_at is not None:
+        # 回退一段时间，覆盖同步期间仍未提交的评分
+        since = RatingService._synced_at - timedelta(
+          seconds=Settings.RATING_SYNC_OVERLAP
+        )
+      updated = 0
+      async for project_ids in RatingService._iter_project_ids(since, chunk_size):
+        rows = await connections.get("default").execute_query_dict(
+          RECOMPUTE_RATINGS_SQL, [project_ids, *prior]
+        )
+        ProjectService.invalidate_project_detail(*(row["id"] for row in rows))
+        updated += len(rows)
+      RatingService._synced_at = started_at
+      return updated
 
   @staticmethod
   async def get_rating(project_id: int, user_id: int):
@@ -37,38 +190,60 @@ class RatingService:
     return rating
 
   @staticmethod
-  @atomic()
-  async def create_rating(project_id: int, user_id: int, rating_create: RatingCreate):
-    project = await ProjectService.get_project_shallow(project_id)
-    project.average_rating = (
-      project.average_rating * project.rating_count + rating_create.score
-    ) / (project.rating_count + 1)
-    project.rating_count += 1
-    await project.save()
-    rating = Rating(
-      project_id=project_id, user_id=user_id, **rating_create.model_dump()
+  def _modified(project_id: int, rows: list[dict]) -> RatingModifiedResponse:
+    ProjectService.invalidate_project_detail(project_id)
+    ProjectService.get_project_ratings.forget(project_id)  # pyright: ignore
+    return RatingModifiedResponse(
+      average_rating=rows[0]["average_rating"], rating_count=rows[0]["rating_count"]
     )
+
+  @staticmethod
+  async def create_rating(project_id: int, user_id: int, rating_create: RatingCreate):
     try:
-      await rating.save()
+      rows = await connections.get("default").execute_query_dict(
+        CREATE_RATING_SQL,
+        [
+          project_id,
+          user_id,
+          rating_create.score,
+          rating_create.is_used,
+          now(),
+          *await ProjectService.get_rating_prior(),
+        ],
+      )
     except IntegrityError:
+      raise ResourceNotFoundError(resource=f"项目ID:{project_id}")
+    if not rows:
       raise ResourceConflictError(message="已存在", resource="评分")
-    return RatingModifiedResponse(
-      average_rating=project.average_rating, rating_count=project.rating_count
-    )
+    return RatingService._modified(project_id, rows)
 
   @staticmethod
-  @atomic()
   async def update_rating(project_id: int, user_id: int, rating_update: RatingUpdate):
-    rating = await RatingService.get_rating(project_id, user_id)
-    project = await ProjectService.get_project_shallow(project_id)
-    if rating_update.score is not None:
-      project.average_rating = (
-        project.average_rating * project.rating_count
-        - rating.score
-        + rating_update.score
-      ) / project.rating_count
-      await project.save()
-    await rating.update_from_dict(rating_update.model_dump(exclude_unset=True)).save()
-    return RatingModifiedResponse(
-      average_rating=project.average_rating, rating_count=project.rating_count
+    rows = await connections.get("default").execute_query_dict(
+      UPDATE_RATING_SQL,
+      [
+        project_id,
+        user_id,
+        rating_update.score,
+        rating_update.is_used,
+        now(),
+        *await ProjectService.get_rating_prior(),
+      ],
     )
+    if not rows:
+      raise ResourceNotFoundError(
+        resource=f"评分不存在,项目ID:{project_id} 用户ID:{user_id}"
+      )
+    return RatingService._modified(project_id, rows)
+
+  @staticmethod
+  async def delete_rating(project_id: int, user_id: int):
+    rows = await connections.get("default").execute_query_dict(
+      DELETE_RATING_SQL,
+      [project_id, user_id, *await ProjectService.get_rating_prior()],
+    )
+    if not rows:
+      raise ResourceNotFoundError(
+        resource=f"评分不存在,项目ID:{project_id} 用户ID:{user_id}"
+      )
+    return RatingService._modified(project_id, rows)
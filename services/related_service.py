@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+from collections import defaultdict
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from scipy import sparse
+from tortoise import connections
+from tortoise.transactions import atomic
+
+from config import Settings
+from models.models import ProjectRelation
+
+# 与给定项目共享标签的项目，及这些项目的全部标签
+NEIGHBOUR_TAGS_SQL = """
+SELECT project_id, tag_id FROM project_tags WHERE project_id IN (
+  SELECT project_id FROM project_tags WHERE tag_id IN (
+    SELECT tag_id FROM project_tags WHERE project_id = ANY($1::int[])
+  )
+)
+"""
+
+DELETE_RELATIONS_SQL = """
+DELETE FROM project_relations AS r
+USING unnest($1::int[], $2::int[]) AS v(project_id, related_id)
+WHERE r.project_id = v.project_id AND r.related_id = v.related_id
+"""
+
+
+class TagMatrix:
+  """项目 × 标签的稀疏 0/1 矩阵，X·Xᵀ 即为两两项目的标签交集大小"""
+
+  def __init__(self, project_tags: dict[int, set[int]]):
+    self.ids = np.array(sorted(project_tags), dtype=np.int64)
+    self.rows = {int(project_id): row for row, project_id in enumerate(self.ids)}
+    columns = {
+      tag_id: column
+      for column, tag_id in enumerate(sorted(set().union(*project_tags.values())))
+    }
+    rows, cols = [], []
+    for project_id, tags in project_tags.items():
+      rows += [self.rows[project_id]] * len(tags)
+      cols += [columns[tag_id] for tag_id in tags]
+    # 交集大小为不超过标签数的整数，float32 运算结果精确
+    self.matrix = sparse.csr_array(
+      (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+      shape=(len(self.ids), len(columns)),
+    )
+    self.transposed = self.matrix.T.tocsr()
+    self.sizes = np.diff(self.matrix.indptr).astype(np.float64)
+
+  def iter_related(
+    self,
+    project_ids: Iterable[int],
+    top_k: Optional[int] = None,
+    block_size: int = Settings.RELATED_BLOCK_SIZE,
+  ) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+    """逐个返回项目的 (项目 id, 相关项目 id, Jaccard 相似度)
+
+    相关项目为共享标签的项目，按相似度从高到低、相同时 id 从小到大排列，
+    指定 top_k 时只返回前 top_k 个；没有标签的项目跳过。
+    """
+    project_ids = [project_id for project_id in project_ids if project_id in self.rows]
+    for start in range(0, len(project_ids), block_size):
+      block = project_ids[start : start + block_size]
+      rows = np.array([self.rows[project_id] for project_id in block], dtype=np.int64)
+      product = (self.matrix[rows] @ self.transposed).tocsr()
+      indptr, cols = product.indptr, product.indices
+      intersections = product.data.astype(np.float64)
+      block_rows = np.repeat(rows, np.diff(indptr))
+      scores = intersections / (
+        self.sizes[block_rows] + self.sizes[cols] - intersections
+      )
+      for i, project_id in enumerate(block):
+        related = slice(indptr[i], indptr[i + 1])
+        other = cols[related] != rows[i]
+        related_cols, related_scores = cols[related][other], scores[related][other]
+        if top_k is not None and len(related_scores) > top_k:
+          # 只排序不低于第 top_k 高分数的项目，保留同分的全部项目
+          kth = np.partition(related_scores, -top_k)[-top_k]
+          kept = related_scores >= kth
+          related_cols, related_scores = related_cols[kept], related_scores[kept]
+        # 行号与项目 id 同序，相同分数时 id 小的在前
+        order = np.lexsort((related_cols, -related_scores))[:top_k]
+        yield project_id, self.ids[related_cols[order]], related_scores[order]
+
+
+def _rank(item: tuple[int, float]):
+  return item[1], -item[0]
+
+
+def top_relations(
+  project_ids: Iterable[int], project_tags: dict[int, set[int]]
+) -> list[ProjectRelation]:
+  related = TagMatrix(project_tags).iter_related(project_ids, Settings.RELATED_TOP_K)
+  return [
+    ProjectRelation(project_id=project_id, related_id=related_id, score=score)
+    for project_id, related_ids, scores in related
+    for related_id, score in zip(related_ids.tolist(), scores.tolist())
+  ]
+
+
+def changed_relations(
+  changed: set[int], listed: set[int], project_tags: dict[int, set[int]]
+) -> tuple[list[ProjectRelation], dict[int, dict[int, float]]]:
+  """变化项目的新列表，以及其他项目与各变化项目的新相似度"""
+  relations = []
+  candidates: dict[int, dict[int, float]] = defaultdict(dict)
+  for project_id, related_ids, scores in TagMatrix(project_tags).iter_related(changed):
+    related = list(zip(related_ids.tolist(), scores.tolist()))
+    relations += [
+      ProjectRelation(project_id=project_id, related_id=related_id, score=score)
+      for related_id, score in related[: Settings.RELATED_TOP_K]
+    ]
+    for other_id, score in related:
+      if other_id not in changed and other_id not in listed:
+        candidates[other_id][project_id] = score
+  return relations, candidates
+
+
+class RelatedService:
+  @staticmethod
+  async def _load_project_tags(sql: str, values: list | None = None):
+    rows = await connections.get("default").execute_query_dict(sql, values)
+    project_tags: dict[int, set[int]] = defaultdict(set)
+    for row in rows:
+      project_tags[row["project_id"]].add(row["tag_id"])
+    return project_tags
+
+  @staticmethod
+  async def _save(project_ids: list[int], project_tags: dict[int, set[int]]):
+    # 矩阵运算较慢，放到线程中执行
+    relations = await asyncio.to_thread(top_relations, project_ids, project_tags)
+    await ProjectRelation.filter(project_id__in=project_ids).delete()
+    await ProjectRelation.bulk_create(relations, batch_size=1000)
+
+  @staticmethod
+  @atomic()
+  async def rebuild():
+    """全量重建相似项目表"""
+    project_tags = await RelatedService._load_project_tags(
+      "SELECT project_id, tag_id FROM project_tags"
+    )
+    await ProjectRelation.all().delete()
+    await RelatedService._save(list(project_tags), project_tags)
+
+  @staticmethod
+  @atomic()
+  async def recompute(*project_ids: int):
+    """重新计算这些项目自身的相似列表"""
+    if not project_ids:
+      return
+    project_tags = await RelatedService._load_project_tags(
+      NEIGHBOUR_TAGS_SQL, [list(project_ids)]
+    )
+    await RelatedService._save(list(project_ids), project_tags)
+
+  @staticmethod
+  @atomic()
+  async def refresh_projects(*project_ids: int):
+    """项目标签变化后，增量更新相似列表
+
+    只计算变化项目与其他项目的相似度：变化项目的列表整体替换；其他项目只在新分数
+    超过其列表中第 K 个时并入；原先列出变化项目的项目，其分数可能下降，才整体重算。
+    """
+    if not project_ids:
+      return
+    changed = set(project_ids)
+    listed = set(
+      await ProjectRelation.filter(related_id__in=project_ids)
+      .exclude(project_id__in=project_ids)
+      .values_list("project_id", flat=True)  # pyright: ignore
+    )
+    project_tags = await RelatedService._load_project_tags(
+      NEIGHBOUR_TAGS_SQL, [list(changed)]
+    )
+    relations, candidates = await asyncio.to_thread(
+      changed_relations, changed, listed, project_tags
+    )
+    await ProjectRelation.filter(project_id__in=list(changed)).delete()
+    relations += await RelatedService._merge_candidates(candidates)
+    await ProjectRelation.bulk_create(relations, batch_size=1000)
+    await RelatedService.recompute(*listed)
+
+  @staticmethod
+  async def _merge_candidates(
+    candidates: dict[int, dict[int, float]],
+  ) -> list[ProjectRelation]:
+    """把新分数并入已保存的前 K 个，删除被挤出的记录，返回需要新增的记录"""
+    if not candidates:
+      return []
+    stored: dict[int, list[tuple[int, float]]] = defaultdict(list)
+    for project_id, related_id, score in await ProjectRelation.filter(
+      project_id__in=list(candidates)
+    ).values_list("project_id", "related_id", "score"):
+      stored[project_id].append((related_id, score))  # pyright: ignore
+    created, removed = [], []
+    for project_id, scores in candidates.items():
+      current = stored[project_id]
+      if len(current) >= Settings.RELATED_TOP_K:
+        kth = min(current, key=_rank)
+        scores = {
+          related_id: score
+          for related_id, score in scores.items()
+          if _rank((related_id, score)) > _rank(kth)
+        }
+        if not scores:
+          continue
+      top = heapq.nlargest(
+        Settings.RELATED_TOP_K, current + list(scores.items()), key=_rank
+      )
+      kept = {related_id for related_id, _ in top}
+      removed += [
+        (project_id, related_id) for related_id, _ in current if related_id not in kept
+      ]
+      created += [
+        ProjectRelation(project_id=project_id, related_id=related_id, score=score)
+        for related_id, score in top
+        if related_id in scores
+      ]
+    if removed:
+      await connections.get("default").execute_query(
+        DELETE_RELATIONS_SQL,
+        [[project_id for project_id, _ in removed], [related for _, related in removed]],
+      )
+    return created
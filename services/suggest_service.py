@@ -0,0 +1,83 @@
+import asyncio
+from typing import Optional
+
+from cutword import Cutter
+from pypinyin import lazy_pinyin
+
+from config import Settings
+from models.models import Project
+from utils.prefix_index import PrefixIndex
+
+# 匹配级别：名称前缀 > 分词前缀 > 拼音/首字母前缀
+NAME_LEVEL, SEGMENT_LEVEL, PINYIN_LEVEL = 0, 1, 2
+
+# 项目名称前缀索引，启动时加载，项目增删改时更新
+project_name_index = PrefixIndex(top_k=Settings.SUGGEST_MAX_LIMIT)
+
+_cutter: Optional[Cutter] = None
+
+
+def _get_cutter() -> Cutter:
+  global _cutter
+  if _cutter is None:
+    _cutter = Cutter()
+  return _cutter
+
+
+def _has_chinese(text: str) -> bool:
+  return any("一" <= char <= "鿿" for char in text)
+
+
+def build_suggest_keys(name: str) -> dict[str, int]:
+  """项目名称的索引键：完整名称、从每个分词开始的后缀、全拼及拼音首字母"""
+  name = name.strip().lower()
+  keys = {name: NAME_LEVEL}
+  segments = [segment for segment in _get_cutter().cutword(name) if segment.strip()]
+  offset = 0
+  for segment in segments:
+    offset = name.find(segment, offset)
+    if offset < 0:
+      break
+    if offset > 0:
+      keys.setdefault(name[offset:].strip(), SEGMENT_LEVEL)
+    offset += len(segment)
+  if not _has_chinese(name):
+    return keys
+  syllables = [lazy_pinyin(segment) for segment in segments]
+  for start in range(len(syllables)):
+    tail = [syllable for group in syllables[start:] for syllable in group]
+    full = "".join(char for char in "".join(tail) if char.isalnum())
+    initials = "".join(syllable[0] for syllable in tail if syllable[:1].isalnum())
+    for key in (full, initials):
+      if key:
+        keys.setdefault(key, PINYIN_LEVEL)
+  return keys
+
+
+class SuggestService:
+  @staticmethod
+  async def load():
+    rows = await Project.all().values_list("id", "name", Settings.SUGGEST_RANK_FIELD)
+    # 分词和拼音转换较慢，放到线程中执行
+    keys = await asyncio.to_thread(
+      lambda: [build_suggest_keys(name) for _, name, _ in rows]
+    )
+    project_name_index.clear()
+    for (project_id, name, rank), name_keys in zip(rows, keys):
+      project_name_index.add(project_id, name, rank, name_keys)
+
+  @staticmethod
+  async def refresh_projects(*project_ids: int):
+    rows = await Project.filter(id__in=project_ids).values_list(
+      "id", "name", Settings.SUGGEST_RANK_FIELD
+    )
+    for project_id, name, rank in rows:
+      project_name_index.add(project_id, name, rank, build_suggest_keys(name))
+
+  @staticmethod
+  def remove_project(project_id: int):
+    project_name_index.remove(project_id)
+
+  @staticmethod
+  def suggest(keyword: str, limit: int = Settings.SUGGEST_LIMIT) -> list[str]:
+    return project_name_index.search(keyword.strip(), limit)
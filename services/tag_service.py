@@ -1,6 +1,10 @@
 from core.exceptions import ResourceNotFoundError
 from models.models import Tag
 from schemas.tags import TagCreate, TagUpdate
+from services.project_service import ProjectService
+from services.related_service import RelatedService
+from tasks.elastic_sync import enqueue_project_sync
+from tortoise.transactions import in_transaction
 
 
 class TagService:
@@ -27,11 +31,19 @@ class TagService:
     if tag is None:
       raise ResourceNotFoundError(resource=f"标签ID:{tag_id}")
     await tag.update_from_dict(tag_update.model_dump(exclude_unset=True)).save()
+    project_ids = await tag.projects.all().values_list("id", flat=True)
+    ProjectService.invalidate_project_detail(*project_ids)  # pyright: ignore
     return tag
 
   @staticmethod
   async def delete_tag(tag_id: int):
-    tag = await Tag.get_or_none(id=tag_id)
-    if tag is None:
-      raise ResourceNotFoundError(resource="标签")
-    await tag.delete()
+    async with in_transaction():
+      tag = await Tag.get_or_none(id=tag_id)
+      if tag is None:
+        raise ResourceNotFoundError(resource="标签")
+      project_ids = await tag.projects.all().values_list("id", flat=True)
+      await tag.delete()
+      await enqueue_project_sync(*project_ids)  # pyright: ignore
+      await RelatedService.refresh_projects(*project_ids)  # pyright: ignore
+    # 提交后再失效，避免并发请求在提交前读到旧数据并重新缓存
+    ProjectService.invalidate_project_detail(*project_ids)  # pyright: ignore
@@ -0,0 +1,111 @@
+import asyncio
+from typing import AsyncIterator
+
+from elasticsearch.dsl import AsyncIndex, async_connections
+from elasticsearch.helpers import async_bulk
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+from config import Settings
+from models.elastic_models import Project as ESProject
+from models.models import Project
+from tasks.elastic_sync import REINDEX_LOCK_ID, project_to_es
+from utils.database import TORTOISE_ORM
+from utils.time import now
+
+# 线上通过别名访问，实际索引为 projects-<时间戳>
+PROJECTS_ALIAS = "projects"
+
+
+async def iter_project_actions(index_name: str, chunk_size: int) -> AsyncIterator[dict]:
+  # 按主键分批读取，避免一次性加载全部项目
+  last_id = 0
+  while True:
+    projects = (
+      await Project.filter(id__gt=last_id)
+      .order_by("id")
+      .limit(chunk_size)
+      .prefetch_related("tags")
+    )
+    if not projects:
+      return
+    for project in projects:
+      yield {
+        "_index": index_name,
+        "_id": project.id,
+        "_source": project_to_es(project).to_dict(),
+      }
+    last_id = projects[-1].id
+
+
+async def reindex_projects(
+  chunk_size: int = Settings.ELASTIC_REINDEX_CHUNK_SIZE,
+) -> str:
+  """全量重建项目索引，完成后原子切换 projects 别名
+
+  重建期间持有 REINDEX_LOCK_ID 暂停处理发件箱：期间的变更留在发件箱中，
+  切换别名后写入新索引，不会只写入即将删除的旧索引。
+  """
+  es = async_connections.get_connection()
+  index_name = f"{PROJECTS_ALIAS}-{now():%Y%m%d%H%M%S}"
+  index = AsyncIndex(index_name)
+  index.document(ESProject)
+  # 导入期间关闭刷新和副本
+  index.settings(number_of_replicas=0, refresh_interval="-1")
+  async with in_transaction() as conn:
+    # 等待正在处理的发件箱批次提交，之后读取的项目数据已包含这些变更
+    await conn.execute_query("SELECT pg_advisory_xact_lock($1)", [REINDEX_LOCK_ID])
+    await index.create()
+    try:
+      await async_bulk(
+        es, iter_project_actions(index_name, chunk_size), chunk_size=chunk_size
+      )
+      # 设置为 None 即恢复默认值
+      await es.indices.put_settings(
+        index=index_name,
+        settings={"index": {"number_of_replicas": None, "refresh_interval": None}},
+      )
+      await es.indices.refresh(index=index_name)
+      old_indices = await swap_alias(index_name)
+    except BaseException:
+      # 清理未完成的新索引，线上仍使用旧索引
+      await es.indices.delete(index=index_name, ignore_unavailable=True)
+      raise
+  for name in old_indices:
+    await es.indices.delete(index=name)
+  return index_name
+
+
+async def swap_alias(index_name: str) -> list[str]:
+  """将 projects 别名切换到 index_name，返回原先指向的索引"""
+  es = async_connections.get_connection()
+  actions: list[dict] = []
+  old_indices: list[str] = []
+  if await es.indices.exists_alias(name=PROJECTS_ALIAS):
+    old_indices = list((await es.indices.get_alias(name=PROJECTS_ALIAS)).body)
+    actions += [
+      {"remove": {"index": name, "alias": PROJECTS_ALIAS}} for name in old_indices
+    ]
+  elif await es.indices.exists(index=PROJECTS_ALIAS):
+    # 早期手动创建的同名实体索引，需在同一次别名操作中删除
+    actions.append({"remove_index": {"index": PROJECTS_ALIAS}})
+  actions.append({"add": {"index": index_name, "alias": PROJECTS_ALIAS}})
+  await es.indices.update_aliases(actions=actions)
+  return old_indices
+
+
+async def main():
+  async_connections.create_connection(
+      hosts=Settings.ELASTIC_URL, api_key=Settings.ELASTIC_APIKEY
+  )
+  await Tortoise.init(config=TORTOISE_ORM)
+  try:
+    index_name = await reindex_projects()
+    print(f"{now()} 重建索引 {index_name} 完成")
+  finally:
+    await Tortoise.close_connections()
+    await async_connections.get_connection().close()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -1,11 +1,24 @@
-from models.models import Project
+import asyncio
+from datetime import timedelta
+
+from elasticsearch.dsl import async_connections
+from elasticsearch.helpers import async_bulk
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from config import Settings
+from models.models import Project, SearchOutbox, SearchOutboxAction
 from models.elastic_models import Project as ESProject
-from elasticsearch.exceptions import NotFoundError
+from utils.time import now
 
+# 全量重建索引期间独占的 advisory lock，持有期间暂停处理发件箱
+REINDEX_LOCK_ID = 20240401
 
-async def sync_project_to_es(project: Project):
+
+def project_to_es(project: Project) -> ESProject:
+  # 需要预先加载 project.tags
   tag_ids = [tag.id for tag in project.tags]
-  es_project = ESProject(
+  return ESProject(
       meta={"id": project.id},
       name=project.name,
       brief=project.brief,
@@ -15,14 +28,113 @@ async def sync_project_to_es(project: Project):
       platform=project.platform,
       is_featured=project.is_featured,
       tags=tag_ids,
+      hot_score=project.hot_score or None,
   )
-  await es_project.save()
 
 
-async def delete_project_from_es(project_id: int):
-  try:
-    doc = await ESProject.get(id=project_id)
-    if doc:
-      await doc.delete()
-  except NotFoundError:
-    pass
+async def enqueue_project_sync(
+    *project_ids: int, action: SearchOutboxAction = SearchOutboxAction.INDEX
+):
+  """写入发件箱，需在修改项目的同一事务中调用"""
+  if not project_ids:
+    return
+  await SearchOutbox.bulk_create(
+      [SearchOutbox(project_id=project_id, action=action) for project_id in project_ids]
+  )
+
+
+def _retry_delay(attempts: int) -> timedelta:
+  seconds = Settings.SEARCH_OUTBOX_RETRY_BASE * 2 ** (attempts - 1)
+  return timedelta(seconds=min(seconds, Settings.SEARCH_OUTBOX_RETRY_MAX))
+
+
+async def drain_search_outbox(batch_size: int) -> int:
+  """处理一批到期的发件箱记录，返回处理的记录数
+
+  重建索引期间不处理，记录留在发件箱中，别名切换到新索引后再写入。
+  """
+  async with in_transaction() as conn:
+    _, rows = await conn.execute_query(
+        "SELECT pg_try_advisory_xact_lock_shared($1) AS acquired", [REINDEX_LOCK_ID]
+    )
+    if not rows[0]["acquired"]:
+      return 0
+    entries = (
+        await SearchOutbox.filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now())
+        )
+        .order_by("id")
+        .limit(batch_size)
+        .select_for_update(skip_locked=True)
+    )
+    if not entries:
+      return 0
+    # 同一项目的多次变更合并为一次操作，以最后一条为准
+    latest: dict[int, SearchOutbox] = {}
+    for entry in entries:
+      latest[entry.project_id] = entry
+    index_ids = [
+        project_id
+        for project_id, entry in latest.items()
+        if entry.action == SearchOutboxAction.INDEX
+    ]
+    projects = {
+        project.id: project
+        for project in await Project.filter(id__in=index_ids).prefetch_related("tags")
+    }
+    actions = []
+    for project_id in latest:
+      if project_id in projects:
+        actions.append({
+            "_op_type": "index",
+            "_index": ESProject.Index.name,
+            "_id": project_id,
+            "_source": project_to_es(projects[project_id]).to_dict(),
+        })
+      else:
+        # 删除操作，或项目在入队后已被删除
+        actions.append(
+            {"_op_type": "delete", "_index": ESProject.Index.name, "_id": project_id}
+        )
+
+    failed: dict[int, str] = {}
+    try:
+      _, errors = await async_bulk(
+          async_connections.get_connection(),
+          actions,
+          raise_on_error=False,
+          raise_on_exception=False,
+      )
+      for error in errors:  # pyright: ignore
+        op_type, info = next(iter(error.items()))
+        if op_type == "delete" and info.get("status") == 404:
+          continue
+        failed[int(info["_id"])] = str(info.get("error", info))
+    except Exception as e:
+      failed = {project_id: str(e) for project_id in latest}
+
+    done_ids = [
+        entry.id
+        for entry in entries
+        if entry.project_id not in failed or latest[entry.project_id] is not entry
+    ]
+    if done_ids:
+      await SearchOutbox.filter(id__in=done_ids).delete()
+    for project_id, error in failed.items():
+      entry = latest[project_id]
+      entry.attempts += 1
+      entry.next_attempt_at = now() + _retry_delay(entry.attempts)
+      entry.last_error = error
+      await entry.save(update_fields=["attempts", "next_attempt_at", "last_error"])
+    return len(entries)
+
+
+async def dispatch_search_outbox(interval: float = 5, batch_size: int = 500):
+  while True:
+    try:
+      # 满批说明可能还有积压，继续处理
+      while await drain_search_outbox(batch_size) == batch_size:
+        pass
+    except Exception as e:
+      print(f"{now()} 同步搜索索引失败: {e}")
+    await asyncio.sleep(interval)
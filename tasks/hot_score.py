@@ -0,0 +1,84 @@
+import asyncio
+
+from tortoise.transactions import in_transaction
+
+from config import Settings
+from services.project_service import ProjectService
+from tasks.elastic_sync import enqueue_project_sync
+from utils.time import now
+
+# 收藏、评论、评分按时间指数衰减（半衰期 $2 小时，只统计最近 $3 天），
+# star 增长取窗口内最早一次同步以来的增量，浏览量取对数，只更新变化的项目
+REFRESH_HOT_SCORES_SQL = """
+WITH favorite_scores AS (
+  SELECT project_id,
+    sum(exp(-ln(2) * extract(epoch FROM $1 - created_at) / 3600 / $2)) AS score
+  FROM favorites WHERE created_at > $1 - make_interval(days => $3)
+  GROUP BY project_id
+), comment_scores AS (
+  SELECT project_id,
+    sum(exp(-ln(2) * extract(epoch FROM $1 - created_at) / 3600 / $2)) AS score
+  FROM comments WHERE created_at > $1 - make_interval(days => $3)
+  GROUP BY project_id
+), rating_scores AS (
+  SELECT project_id,
+    sum(exp(-ln(2) * extract(epoch FROM $1 - updated_at) / 3600 / $2)) AS score
+  FROM ratings WHERE updated_at > $1 - make_interval(days => $3)
+  GROUP BY project_id
+), star_baselines AS (
+  SELECT DISTINCT ON (project_id) project_id, (project_detail->>'stars')::int AS stars
+  FROM sync_logs
+  WHERE created_at > $1 - make_interval(days => $3)
+    AND status = 'success' AND project_detail ? 'stars'
+  ORDER BY project_id, created_at
+), scores AS (
+  SELECT p.id,
+    $4 * COALESCE(f.score, 0)
+    + $5 * COALESCE(c.score, 0)
+    + $6 * COALESCE(r.score, 0)
+    + $7 * ln(1 + GREATEST(p.stars - COALESCE(s.stars, p.stars), 0))
+    + $8 * ln(1 + p.view_count) AS hot_score
+  FROM projects AS p
+  LEFT JOIN favorite_scores AS f ON f.project_id = p.id
+  LEFT JOIN comment_scores AS c ON c.project_id = p.id
+  LEFT JOIN rating_scores AS r ON r.project_id = p.id
+  LEFT JOIN star_baselines AS s ON s.project_id = p.id
+)
+UPDATE projects AS p SET hot_score = s.hot_score
+FROM scores AS s
+WHERE p.id = s.id AND abs(p.hot_score - s.hot_score) > 1e-6
+RETURNING p.id
+"""
+
+
+async def refresh_hot_scores() -> int:
+  """重新计算所有项目的热度，返回热度有变化的项目数"""
+  weights = Settings.HOT_SCORE_WEIGHTS
+  async with in_transaction() as conn:
+    rows = await conn.execute_query_dict(
+        REFRESH_HOT_SCORES_SQL,
+        [
+            now(),
+            float(Settings.HOT_SCORE_HALF_LIFE),
+            Settings.HOT_SCORE_WINDOW,
+            float(weights["favorite"]),
+            float(weights["comment"]),
+            float(weights["rating"]),
+            float(weights["star"]),
+            float(weights["view"]),
+        ],
+    )
+    project_ids = [row["id"] for row in rows]
+    await enqueue_project_sync(*project_ids)
+  ProjectService.invalidate_project_detail(*project_ids)
+  return len(project_ids)
+
+
+async def dispatch_hot_scores(interval: float = 600):
+  while True:
+    try:
+      count = await refresh_hot_scores()
+      print(f"{now()} 更新项目热度 {count} 个")
+    except Exception as e:
+      print(f"{now()} 更新项目热度失败: {e}")
+    await asyncio.sleep(interval)
@@ -1,26 +1,331 @@
 import asyncio
-from datetime import timedelta
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-from models.models import Project, SyncLog
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from config import Settings
+from models.models import HttpValidator, Platform, Project, SyncLog
+from schemas.projects import ProjectRepoDetail
 from services.project_service import ProjectService
+from services.suggest_service import SuggestService
+from tasks.elastic_sync import enqueue_project_sync
+from utils.github_api import GitHubAPI
+from utils.httpx_client import (
+  ValidatorCache,
+  deferred_validators,
+  save_validators,
+  validator_cache,
+)
+from utils.rate_limit import background_requests
 from utils.time import now
 
 
+# 同步写入的字段，与 ProjectRepoDetail 一致，按顺序对应 UPDATE_SYNCED_PROJECTS_SQL 的参数
+SYNC_FIELDS = (
+  "repo_url",
+  "avatar",
+  "name",
+  "website_url",
+  "stars",
+  "forks",
+  "watchers",
+  "contributors",
+  "issues",
+  "license",
+  "programming_language",
+  "last_commit_at",
+  "repo_created_at",
+  "owner_platform_id",
+  "last_sync_at",
+)
+
+UPDATE_SYNCED_PROJECTS_SQL = """
+UPDATE projects AS p SET
+  repo_url = v.repo_url,
+  avatar = v.avatar,
+  name = v.name,
+  website_url = v.website_url,
+  stars = v.stars,
+  forks = v.forks,
+  watchers = v.watchers,
+  contributors = v.contributors,
+  issues = v.issues,
+  license = v.license,
+  programming_language = v.programming_language,
+  last_commit_at = v.last_commit_at,
+  repo_created_at = v.repo_created_at,
+  owner_platform_id = v.owner_platform_id,
+  last_sync_at = v.last_sync_at
+FROM unnest(
+  $1::int[], $2::text[], $3::text[], $4::text[], $5::text[], $6::int[], $7::int[],
+  $8::int[], $9::int[], $10::int[], $11::text[], $12::text[], $13::timestamptz[],
+  $14::timestamptz[], $15::int[], $16::timestamptz[]
+) AS v(
+  id, repo_url, avatar, name, website_url, stars, forks, watchers, contributors,
+  issues, license, programming_language, last_commit_at, repo_created_at,
+  owner_platform_id, last_sync_at
+)
+WHERE p.id = v.id
+"""
+
+TOUCH_SYNCED_PROJECTS_SQL = """
+UPDATE projects SET last_sync_at = $1 WHERE id = ANY($2::int[])
+"""
+
+
+async def iter_stale_projects(
+  cutoff: datetime, chunk_size: int
+) -> AsyncIterator[list[Project]]:
+  # 按主键分批读取需要同步的项目，同时读取已同步的字段用于判断是否变化
+  last_id = 0
+  while True:
+    projects = (
+      await Project.filter(
+        Q(last_sync_at__isnull=True) | Q(last_sync_at__lt=cutoff), id__gt=last_id
+      )
+      .order_by("id")
+      .limit(chunk_size)
+      .only("id", "repo_id", "platform", *SYNC_FIELDS)
+    )
+    if not projects:
+      return
+    yield projects
+    last_id = projects[-1].id
+
+
+RepoDetailFetcher = Callable[[], Awaitable[Optional[ProjectRepoDetail]]]
+
+
+def fetch_rest(project: Project) -> RepoDetailFetcher:
+  return partial(
+    ProjectService.get_repo_detail_if_modified, project.platform, project.repo_id
+  )
+
+
+async def fetch_github_batch(
+  projects: list[Project],
+) -> list[tuple[Project, RepoDetailFetcher]]:
+  """一次 GraphQL 查询获取一批 GitHub 仓库，查询失败时退回逐个 REST 请求"""
+  try:
+    repos = await GitHubAPI.get_repos_graphql([project.repo_id for project in projects])
+  except Exception as e:
+    print(f"{now()} 批量获取 GitHub 仓库失败，改为逐个同步: {e}")
+    return [(project, fetch_rest(project)) for project in projects]
+  return [
+    (
+      project,
+      partial(ProjectService.get_github_graphql_repo_detail, project.repo_id, repo),
+    )
+    for project, repo in zip(projects, repos)
+  ]
+
+
+def is_unchanged(project: Project, project_detail: ProjectRepoDetail) -> bool:
+  return all(
+    getattr(project, field) == getattr(project_detail, field)
+    for field in SYNC_FIELDS
+    if field != "last_sync_at"
+  )
+
+
+class SyncResultWriter:
+  """累计同步结果，在一个事务中批量更新项目、条件请求的校验信息、同步日志和搜索发件箱
+
+  校验信息与项目数据一同写入：写入失败时下个周期不会收到 304 而丢失仓库的变化。
+  """
+
+  def __init__(self):
+    self._updated: dict[int, ProjectRepoDetail] = {}
+    self._failed: dict[int, str] = {}
+    self._unchanged: list[int] = []
+    self._validators: list[HttpValidator] = []
+
+  @property
+  def pending(self) -> int:
+    return len(self._updated) + len(self._failed) + len(self._unchanged)
+
+  def success(
+    self,
+    project_id: int,
+    project_detail: ProjectRepoDetail,
+    validators: list[HttpValidator],
+  ):
+    self._updated[project_id] = project_detail
+    self._validators.extend(validators)
+
+  def failed(self, project_id: int, error: str):
+    # 失败项目已收到的校验信息不保存，下次重新完整请求
+    self._failed[project_id] = error
+
+  def unchanged(self, project_id: int, validators: list[HttpValidator]):
+    self._unchanged.append(project_id)
+    self._validators.extend(validators)
+
+  async def flush(self) -> int:
+    """写入累计的结果，返回写入的项目数
+
+    写入失败时丢弃本批结果，这些项目的 last_sync_at 未更新，下个周期会重新同步。
+    """
+    updated, self._updated = self._updated, {}
+    failed, self._failed = self._failed, {}
+    unchanged, self._unchanged = self._unchanged, []
+    validators, self._validators = self._validators, []
+    if not updated and not failed and not unchanged:
+      return 0
+    details = [detail.model_dump() for detail in updated.values()]
+    try:
+      async with in_transaction() as conn:
+        if updated:
+          await conn.execute_query(
+            UPDATE_SYNCED_PROJECTS_SQL,
+            [
+              list(updated),
+              *([detail[field] for detail in details] for field in SYNC_FIELDS),
+            ],
+          )
+        # 失败的项目同样推迟到下个周期，避免每轮重复消耗配额
+        touched = [*failed, *unchanged]
+        if touched:
+          await conn.execute_query(TOUCH_SYNCED_PROJECTS_SQL, [now(), touched])
+        await save_validators(conn, validators)
+        logs = [
+          SyncLog(project_id=project_id, status="success", project_detail=detail)
+          for project_id, detail in zip(updated, details)
+        ] + [
+          SyncLog(project_id=project_id, status="failed", project_detail={"error": e})
+          for project_id, e in failed.items()
+        ]
+        if logs:
+          await SyncLog.bulk_create(logs)
+        await enqueue_project_sync(*updated)
+    except Exception as e:
+      print(f"{now()} 写入同步结果失败: {e}")
+      return 0
+    if updated:
+      await SuggestService.refresh_projects(*updated)
+      ProjectService.invalidate_project_detail(*updated)
+    return len(updated) + len(failed) + len(unchanged)
+
+
+async def sync_project(
+  project: Project,
+  writer: SyncResultWriter,
+  fetch: Optional[RepoDetailFetcher] = None,
+) -> str:
+  """同步单个项目，结果交由 writer 批量写入，返回 success / unchanged / failed
+
+  fetch 为预先取得的仓库信息，默认使用 REST 条件请求；仓库未变化或与已保存的字段
+  相同时只更新 last_sync_at。
+  """
+  validators: list[HttpValidator] = []
+  token = deferred_validators.set(validators)
+  try:
+    project_detail = await (fetch or fetch_rest(project))()
+  except Exception as e:
+    writer.failed(project.id, str(e))
+    print(f"{now()} 同步项目 {project.name} 失败: {e}")
+    return "failed"
+  finally:
+    deferred_validators.reset(token)
+  if project_detail is None or is_unchanged(project, project_detail):
+    writer.unchanged(project.id, validators)
+    return "unchanged"
+  writer.success(project.id, project_detail, validators)
+  return "success"
+
+
+async def sync_stale_projects(
+  frequency: float, workers: int = 16, chunk_size: int = 500
+) -> Counter[str]:
+  """并发同步超过 frequency 秒未同步的项目，返回各结果的数量
+
+  配置了 GITHUB_TOKEN 时 GitHub 项目按 GITHUB_GRAPHQL_BATCH_SIZE 个一批通过 GraphQL
+  获取，其余项目逐个使用 REST 条件请求。每批项目的校验信息一次预读，
+  结果每 chunk_size 个写入一次。
+  """
+  background_requests.set(True)
+  cache = ValidatorCache()
+  validator_cache.set(cache)
+  limits = {
+    platform: asyncio.Semaphore(Settings.SYNC_PLATFORM_CONCURRENCY[platform.value])
+    for platform in Platform
+  }
+  queue: asyncio.Queue[tuple[Project, RepoDetailFetcher]] = asyncio.Queue(
+    maxsize=workers * 2
+  )
+  github_batch: list[Project] = []
+  results: Counter[str] = Counter()
+  writer = SyncResultWriter()
+
+  def use_graphql(project: Project) -> bool:
+    return project.platform == Platform.GITHUB and bool(Settings.GITHUB_TOKEN)
+
+  async def put_github_batch():
+    nonlocal github_batch
+    projects, github_batch = github_batch, []
+    if projects:
+      for item in await fetch_github_batch(projects):
+        await queue.put(item)
+
+  async def worker():
+    while True:
+      project, fetch = await queue.get()
+      try:
+        async with limits[project.platform]:
+          result = await sync_project(project, writer, fetch)
+        results[result] += 1
+        if writer.pending >= chunk_size:
+          await writer.flush()
+      except Exception as e:
+        results["failed"] += 1
+        print(f"{now()} 同步项目 {project.name} 失败: {e}")
+      finally:
+        queue.task_done()
+
+  tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+  try:
+    cutoff = now() - timedelta(seconds=frequency)
+    async for projects in iter_stale_projects(cutoff, chunk_size):
+      await cache.preload(
+        [
+          key
+          for project in projects
+          for key in ProjectService.repo_validator_keys(
+            project.platform, project.repo_id, contributors_only=use_graphql(project)
+          )
+        ]
+      )
+      for project in projects:
+        if not use_graphql(project):
+          await queue.put((project, fetch_rest(project)))
+          continue
+        github_batch.append(project)
+        if len(github_batch) >= Settings.GITHUB_GRAPHQL_BATCH_SIZE:
+          await put_github_batch()
+    await put_github_batch()
+    await queue.join()
+  finally:
+    for task in tasks:
+      task.cancel()
+    await writer.flush()
+  return results
+
+
 async def sync_projects(interval: float = 600, frequency: float = 86400):
   while True:
     try:
       await asyncio.sleep(interval)
-      projects = await Project.filter(
-        last_sync_at__lt=now() - timedelta(seconds=frequency)
-      ).only("id", "name", "repo_id", "platform")
-      for project in projects:
-        project_detail = await ProjectService.get_repo_detail(
-          project.platform, project.repo_id
-        )
-        await Project.filter(id=project.id).update(**project_detail.model_dump())
-        await SyncLog.create(
-          project=project, status="success", project_detail=project_detail.model_dump()
+      results = await sync_stale_projects(
+        frequency, workers=Settings.SYNC_WORKERS, chunk_size=Settings.SYNC_CHUNK_SIZE
+      )
+      if results:
+        print(
+          f"{now()} 同步项目完成: 成功 {results['success']} 个, "
+          f"未变化 {results['unchanged']} 个, 失败 {results['failed']} 个"
         )
-        print(f"{now()} 同步项目 {project.name} 成功")
     except Exception as e:
       print(f"{now()} 同步项目失败: {e}")
@@ -0,0 +1,151 @@
+import asyncio
+from collections import Counter
+from datetime import date
+from typing import Optional
+
+from tortoise.transactions import in_transaction
+
+from config import Settings
+from utils.hyperloglog import HyperLogLog
+from utils.time import now
+
+# 所有语句按 (project_id, day) 顺序加锁，多个进程同时写入时不会死锁
+FLUSH_VIEW_COUNTS_SQL = """
+WITH locked AS MATERIALIZED (
+  SELECT id FROM projects WHERE id = ANY($1::int[]) ORDER BY id FOR UPDATE
+)
+UPDATE projects AS p SET view_count = p.view_count + v.n
+FROM unnest($1::int[], $2::int[]) AS v(id, n)
+JOIN locked ON locked.id = v.id
+WHERE p.id = v.id
+"""
+
+# 先补齐缺失的行，再锁定并合并草图
+INSERT_VISITOR_SKETCHES_SQL = """
+INSERT INTO project_visitor_sketches (project_id, day, sketch)
+SELECT v.id, v.day, ''::bytea FROM unnest($1::int[], $2::date[]) AS v(id, day)
+WHERE EXISTS (SELECT 1 FROM projects WHERE id = v.id)
+ORDER BY v.id, v.day
+ON CONFLICT (project_id, day) DO NOTHING
+"""
+
+LOCK_VISITOR_SKETCHES_SQL = """
+SELECT s.project_id, s.day, s.sketch FROM project_visitor_sketches AS s
+JOIN unnest($1::int[], $2::date[]) AS v(id, day) ON s.project_id = v.id AND s.day = v.day
+ORDER BY s.project_id, s.day
+FOR UPDATE OF s
+"""
+
+UPDATE_VISITOR_SKETCHES_SQL = """
+UPDATE project_visitor_sketches AS s SET sketch = v.sketch
+FROM unnest($1::int[], $2::date[], $3::bytea[]) AS v(id, day, sketch)
+WHERE s.project_id = v.id AND s.day = v.day
+"""
+
+
+class ViewCounter:
+  """在内存中累计浏览量和每日独立访客草图，定时或积压达到阈值时批量写入数据库"""
+
+  def __init__(self, flush_threshold: int = 1000, precision: int = 12):
+    self.flush_threshold = flush_threshold
+    self.precision = precision
+    self._counts: Counter[int] = Counter()
+    self._sketches: dict[tuple[int, date], HyperLogLog] = {}
+    self._pending = 0
+    self._lock = asyncio.Lock()
+    self._flush_event = asyncio.Event()
+
+  @property
+  def pending(self) -> int:
+    """尚未写入数据库的浏览次数"""
+    return self._pending
+
+  def increment(self, project_id: int, visitor: Optional[str] = None, count: int = 1):
+    self._counts[project_id] += count
+    self._pending += count
+    if visitor is not None:
+      key = (project_id, now().date())
+      sketch = self._sketches.get(key)
+      if sketch is None:
+        sketch = self._sketches[key] = HyperLogLog(self.precision)
+      sketch.add(visitor)
+    if self._pending >= self.flush_threshold:
+      self._flush_event.set()
+
+  def pending_sketches(self, project_id: int, since: date) -> list[HyperLogLog]:
+    """尚未写入数据库的访客草图"""
+    return [
+        sketch
+        for (sketch_project_id, day), sketch in self._sketches.items()
+        if sketch_project_id == project_id and day >= since
+    ]
+
+  async def flush(self) -> int:
+    """写入所有累计的浏览量和访客草图，返回写入的浏览次数"""
+    async with self._lock:
+      self._flush_event.clear()
+      counts, self._counts = self._counts, Counter()
+      sketches, self._sketches = self._sketches, {}
+      pending, self._pending = self._pending, 0
+      if not counts and not sketches:
+        return 0
+      try:
+        async with in_transaction() as conn:
+          if counts:
+            project_ids = sorted(counts)
+            await conn.execute_query(
+                FLUSH_VIEW_COUNTS_SQL,
+                [project_ids, [counts[project_id] for project_id in project_ids]],
+            )
+          if sketches:
+            await self._merge_sketches(conn, sketches)
+      except BaseException:
+        # 写入失败或任务被取消时放回，等待下次写入（包括关闭时的最后一次写入）
+        self._counts.update(counts)
+        self._pending += pending
+        for key, sketch in sketches.items():
+          if key in self._sketches:
+            sketch.merge(self._sketches[key])
+          self._sketches[key] = sketch
+        raise
+      return pending
+
+  async def _merge_sketches(self, conn, sketches: dict[tuple[int, date], HyperLogLog]):
+    keys = sorted(sketches)
+    project_ids = [project_id for project_id, _ in keys]
+    days = [day for _, day in keys]
+    await conn.execute_query(INSERT_VISITOR_SKETCHES_SQL, [project_ids, days])
+    _, rows = await conn.execute_query(LOCK_VISITOR_SKETCHES_SQL, [project_ids, days])
+    merged: dict[tuple[int, date], HyperLogLog] = {}
+    for row in rows:
+      key = (row["project_id"], row["day"])
+      sketch = HyperLogLog.from_bytes(row["sketch"], self.precision)
+      sketch.merge(sketches[key])
+      merged[key] = sketch
+    if merged:
+      await conn.execute_query(
+          UPDATE_VISITOR_SKETCHES_SQL,
+          [
+              [project_id for project_id, _ in merged],
+              [day for _, day in merged],
+              [sketch.to_bytes() for sketch in merged.values()],
+          ],
+      )
+
+  async def run(self, interval: float):
+    while True:
+      try:
+        await asyncio.wait_for(self._flush_event.wait(), timeout=interval)
+      except asyncio.TimeoutError:
+        pass
+      try:
+        await self.flush()
+      except Exception as e:
+        print(f"{now()} 写入浏览量失败: {e}")
+        await asyncio.sleep(interval)
+
+
+view_counter = ViewCounter(
+    flush_threshold=Settings.VIEW_COUNT_FLUSH_THRESHOLD,
+    precision=Settings.VISITOR_SKETCH_PRECISION,
+)
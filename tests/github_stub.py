@@ -0,0 +1,152 @@
+"""
+用 jsons/ 中的样例数据模拟 GitHub API，调试仓库同步时不消耗真实配额。
+
+  python -m tests.github_stub                 # 启动桩服务器
+  python -m tests.github_stub --check         # 对比 REST 与 GraphQL 批量获取的结果
+
+启动后设置 GITHUB_API_URL=http://127.0.0.1:8001 与任意 GITHUB_TOKEN 运行服务即可。
+任意 owner/name 都返回样例仓库（名称替换为请求的仓库），名称以 missing 开头的仓库不存在。
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+JSONS = Path(__file__).resolve().parent.parent / "jsons"
+REPO = json.loads((JSONS / "GitHubAPI_repo.json").read_text(encoding="utf-8"))
+CONTRIBUTORS = json.loads(
+    (JSONS / "GitHubAPI_repo_contributors.json").read_text(encoding="utf-8")
+)
+
+
+def rest_repo(owner: str, name: str) -> dict:
+  return {**REPO, "name": name, "full_name": f"{owner}/{name}"}
+
+
+def graphql_repo(owner: str, name: str) -> dict:
+  repo = rest_repo(owner, name)
+  return {
+      "name": repo["name"],
+      "nameWithOwner": repo["full_name"],
+      "homepageUrl": repo["homepage"],
+      "stargazerCount": repo["stargazers_count"],
+      "forkCount": repo["forks_count"],
+      "watchers": {"totalCount": repo["subscribers_count"]},
+      # REST 的 open_issues_count 包含 PR，样例数据中全部计为 issue
+      "issues": {"totalCount": repo["open_issues_count"]},
+      "pullRequests": {"totalCount": 0},
+      "licenseInfo": repo["license"] and {"spdxId": repo["license"]["spdx_id"]},
+      "primaryLanguage": repo["language"] and {"name": repo["language"]},
+      "pushedAt": repo["pushed_at"],
+      "createdAt": repo["created_at"],
+      "owner": {
+          "avatarUrl": repo["owner"]["avatar_url"],
+          "databaseId": repo["owner"]["id"],
+      },
+  }
+
+
+class GitHubStubHandler(BaseHTTPRequestHandler):
+
+  def send_json(self, data, status: int = 200, headers: dict = {}):
+    body = json.dumps(data).encode()
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    if self.command == "GET" and self.headers.get("If-None-Match") == etag:
+      status, body = 304, b""
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("ETag", etag)
+    self.send_header("X-RateLimit-Remaining", "4999")
+    self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+    for key, value in headers.items():
+      self.send_header(key, value)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):
+    url = urlparse(self.path)
+    parts = url.path.strip("/").split("/")
+    if len(parts) < 3 or parts[0] != "repos" or parts[2].startswith("missing"):
+      return self.send_json({"message": "Not Found"}, 404)
+    owner, name = parts[1], parts[2]
+    if len(parts) == 3:
+      return self.send_json(rest_repo(owner, name))
+    if parts[3:] != ["contributors"]:
+      return self.send_json({"message": "Not Found"}, 404)
+    query = parse_qs(url.query)
+    per_page = int(query.get("per_page", ["30"])[0])
+    page = int(query.get("page", ["1"])[0])
+    last = max((len(CONTRIBUTORS) + per_page - 1) // per_page, 1)
+    headers = {}
+    if last > 1:
+      base = f"http://{self.headers['Host']}{url.path}"
+      headers["Link"] = (
+          f'<{base}?{urlencode({"per_page": per_page, "page": last})}>; rel="last"'
+      )
+    self.send_json(
+        CONTRIBUTORS[(page - 1) * per_page : page * per_page], headers=headers
+    )
+
+  def do_POST(self):
+    if urlparse(self.path).path != "/graphql":
+      return self.send_json({"message": "Not Found"}, 404)
+    body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+    variables = body.get("variables", {})
+    data, errors = {}, []
+    for i in range(len(variables) // 2):
+      owner, name = variables[f"o{i}"], variables[f"n{i}"]
+      if name.startswith("missing"):
+        data[f"r{i}"] = None
+        errors.append({"type": "NOT_FOUND", "path": [f"r{i}"]})
+      else:
+        data[f"r{i}"] = graphql_repo(owner, name)
+    self.send_json({"data": data, **({"errors": errors} if errors else {})})
+
+
+async def check(repo_ids: list[str]):
+  from services.project_service import ProjectService
+  from utils.github_api import GitHubAPI
+
+  repos = await GitHubAPI.get_repos_graphql(repo_ids)
+  for repo_id, repo in zip(repo_ids, repos):
+    if repo is None:
+      print(f"{repo_id}: 不存在")
+      continue
+    contributors = await GitHubAPI.get_repo_contributor_count(repo_id)
+    batched = ProjectService._github_graphql_repo_detail(repo, contributors)
+    single = await ProjectService.get_github_repo_detail(repo_id)
+    exclude = {"last_sync_at"}
+    assert batched.model_dump(exclude=exclude) == single.model_dump(exclude=exclude)
+    print(f"{repo_id}: {batched.model_dump(exclude=exclude)}")
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--port", type=int, default=8001)
+  parser.add_argument("--check", action="store_true")
+  args = parser.parse_args()
+  server = ThreadingHTTPServer(("127.0.0.1", args.port), GitHubStubHandler)
+  if not args.check:
+    print(f"GitHub API 桩服务器: http://127.0.0.1:{args.port}")
+    server.serve_forever()
+    return
+  # Settings 在导入时读取环境变量，需要在导入服务之前设置
+  os.environ["GITHUB_API_URL"] = f"http://127.0.0.1:{args.port}"
+  os.environ.setdefault("GITHUB_TOKEN", "stub")
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  try:
+    asyncio.run(check(["maotoumao/MusicFree", "octocat/Hello-World", "a/missing"]))
+  finally:
+    server.shutdown()
+
+
+if __name__ == "__main__":
+  main()
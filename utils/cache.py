@@ -0,0 +1,57 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+  """进程内 LRU 缓存，条目超过 ttl 秒后失效"""
+
+  def __init__(self, maxsize: int = 1024, ttl: float = 60):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def get(self, key: K) -> Optional[V]:
+    item = self._data.get(key)
+    if item is None:
+      self.misses += 1
+      return None
+    expires_at, value = item
+    if expires_at < time.monotonic():
+      del self._data[key]
+      self.misses += 1
+      return None
+    self._data.move_to_end(key)
+    self.hits += 1
+    return value
+
+  def set(self, key: K, value: V):
+    self._data[key] = (time.monotonic() + self.ttl, value)
+    self._data.move_to_end(key)
+    while len(self._data) > self.maxsize:
+      self._data.popitem(last=False)
+      self.evictions += 1
+
+  def invalidate(self, key: K):
+    self._data.pop(key, None)
+
+  def clear(self):
+    self._data.clear()
+
+  def stats(self) -> dict[str, int]:
+    return {
+      "size": len(self._data),
+      "maxsize": self.maxsize,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+    }
+
+  def __len__(self):
+    return len(self._data)
@@ -0,0 +1,21 @@
+import base64
+import json
+from typing import Any
+
+from core.exceptions import ValidationError
+
+
+def encode_cursor(data: dict[str, Any]) -> str:
+  raw = json.dumps(data, separators=(",", ":"), default=str).encode()
+  return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    data = json.loads(raw)
+  except Exception:
+    raise ValidationError(message="无效的分页游标")
+  if not isinstance(data, dict):
+    raise ValidationError(message="无效的分页游标")
+  return data
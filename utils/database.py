@@ -1,8 +1,17 @@
-from typing import TYPE_CHECKING, TypeVar
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
 
+from tortoise import connections, fields
+from tortoise.expressions import Q
 from tortoise.queryset import QuerySet
 from config import Settings
-from schemas.common import PaginatedData, PaginationParams
+from schemas.common import Order, PaginatedData, PaginationParams
+from core.exceptions import ValidationError
+from utils.cache import TTLCache
+from utils.cursor import decode_cursor, encode_cursor
 
 # 定义模型模块
 TORTOISE_ORM = {
@@ -22,17 +31,169 @@ if TYPE_CHECKING:  # pragma: nocoverage
 MODEL = TypeVar("MODEL", bound="Model")
 
 
+# 精确总数缓存：按表分组，按规范化的 COUNT SQL 缓存，表有增删时整组失效
+count_caches: defaultdict[str, TTLCache[str, int]] = defaultdict(
+  lambda: TTLCache(maxsize=Settings.COUNT_CACHE_SIZE, ttl=Settings.COUNT_CACHE_TTL)
+)
+
+
+def invalidate_count_cache(model: "type[Model]"):
+  count_caches.pop(model._meta.db_table, None)
+
+
+async def estimate_count(query: QuerySet[MODEL]) -> int:
+  """使用 PostgreSQL 查询计划的估计行数"""
+  sql = query.sql(params_inline=True)
+  rows = await connections.get("default").execute_query_dict(
+    f"EXPLAIN (FORMAT JSON) {sql}"
+  )
+  plan = rows[0]["QUERY PLAN"]
+  if isinstance(plan, str):
+    plan = json.loads(plan)
+  return int(plan[0]["Plan"]["Rows"])
+
+
+async def fetch_with_total(
+  page_query: QuerySet[MODEL],
+  count_query: QuerySet[MODEL],
+  estimate_threshold: Optional[int] = Settings.COUNT_ESTIMATE_THRESHOLD,
+) -> tuple[list[MODEL], int, bool]:
+  """查询当前页及总数，返回 (结果, 总数, 总数是否精确)
+
+  精确总数优先取缓存；未命中时与分页查询并发执行。设置了 estimate_threshold 时，
+  估计行数超过阈值则直接使用估计值。
+  """
+  cache = count_caches[count_query.model._meta.db_table]
+  count_key = count_query.count().sql(params_inline=True)
+  total = cache.get(count_key)
+  if total is None and estimate_threshold is not None:
+    estimate = await estimate_count(count_query)
+    if estimate > estimate_threshold:
+      return list(await page_query), estimate, False
+  if total is not None:
+    return list(await page_query), total, True
+  results, total = await asyncio.gather(page_query, count_query.count())
+  cache.set(count_key, total)
+  return list(results), total, True
+
+
 async def pagination_query(
   pagination_params: PaginationParams, query: QuerySet[MODEL]
 ) -> PaginatedData[MODEL]:
   page, page_size = pagination_params.page, pagination_params.page_size
   offset = (page - 1) * page_size
-  results = await query.offset(offset).limit(page_size)
-  total = await query.count()
+  results, total, total_exact = await fetch_with_total(
+    query.offset(offset).limit(page_size), query
+  )
   return PaginatedData(
     items=results,
     total=total,
+    total_exact=total_exact,
     page=page,
     page_size=page_size,
     pages=(total + page_size - 1) // page_size,
   )
+
+
+def _cursor_value(field_object: fields.Field, value: Any) -> Any:
+  """校验游标中的排序值与字段类型一致，时间字段转换为 datetime"""
+  if value is None:
+    if not field_object.null:
+      raise ValidationError(message="无效的分页游标")
+    return None
+  if isinstance(field_object, fields.DatetimeField):
+    try:
+      return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+      raise ValidationError(message="无效的分页游标")
+  if isinstance(field_object, fields.FloatField):
+    valid = isinstance(value, (int, float))
+  elif isinstance(field_object, fields.IntField):
+    valid = isinstance(value, int)
+  else:
+    valid = isinstance(value, str)
+  # bool 是 int 的子类，同样视为无效
+  if not valid or isinstance(value, bool):
+    raise ValidationError(message="无效的分页游标")
+  return value
+
+
+def _keyset_filters(
+  field: str, value: Any, last_id: int, descending: bool, nullable: bool
+) -> list[Q]:
+  """游标之后的记录按排序顺序拆成若干段，每段都能直接在 (field, id) 索引上定位
+
+  分段而不是用 OR 合并：OR 条件只能从索引头部逐行过滤，深度翻页仍是线性耗时。
+  """
+  op = "lt" if descending else "gt"
+  if field == "id":
+    return [Q(**{f"id__{op}": last_id})]
+  # PostgreSQL 中 NULL 在降序时排最前，升序时排最后
+  if value is None:
+    filters = [Q(**{f"{field}__isnull": True, f"id__{op}": last_id})]
+    if descending:
+      filters.append(Q(**{f"{field}__isnull": False}))
+    return filters
+  # 冗余的 field <= value（升序为 >=）给出索引扫描的起点
+  filters = [
+    Q(**{f"{field}__{op}e": value})
+    & (Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": last_id}))
+  ]
+  if nullable and not descending:
+    filters.append(Q(**{f"{field}__isnull": True}))
+  return filters
+
+
+async def keyset_pagination_query(
+  pagination_params: PaginationParams,
+  query: QuerySet[MODEL],
+  order_by: str,
+  order: Order,
+  cursor: Optional[str] = None,
+) -> PaginatedData[MODEL]:
+  """游标（seek）分页，按 (order_by, id) 定位，需要对应的联合索引"""
+  page_size = pagination_params.page_size
+  field_object = query.model._meta.fields_map[order_by]
+  descending = order == "desc"
+  prefix = "-" if descending else ""
+  ordering = [f"{prefix}id"]
+  if order_by != "id":
+    ordering.insert(0, f"{prefix}{order_by}")
+  page_query, filters = query, []
+  if cursor:
+    data = decode_cursor(cursor)
+    value, last_id = data.get("v"), data.get("id")
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+      raise ValidationError(message="无效的分页游标")
+    value = _cursor_value(field_object, value)
+    first, *filters = _keyset_filters(
+      order_by, value, last_id, descending, field_object.null
+    )
+    page_query = query.filter(first)
+  results, total, total_exact = await fetch_with_total(
+    page_query.order_by(*ordering).limit(page_size + 1), query
+  )
+  # 第一段不足一页时依次从后续分段补齐
+  for q in filters:
+    if len(results) > page_size:
+      break
+    results += await (
+      query.filter(q).order_by(*ordering).limit(page_size + 1 - len(results))
+    )
+  next_cursor = None
+  if len(results) > page_size:
+    results = results[:page_size]
+    last = results[-1]
+    value = getattr(last, order_by)
+    next_cursor = encode_cursor(
+      {"v": value.isoformat() if isinstance(value, datetime) else value, "id": last.pk}
+    )
+  return PaginatedData(
+    items=results,
+    total=total,
+    total_exact=total_exact,
+    page=pagination_params.page,
+    page_size=page_size,
+    pages=(total + page_size - 1) // page_size,
+    next_cursor=next_cursor,
+  )
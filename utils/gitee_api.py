@@ -1,23 +1,73 @@
-from typing import Any
+from typing import Any, Callable
+import httpx
 from fastapi import status
 from config import Settings
 from core.exceptions import ApiError
 from core.exceptions.client_errors import AuthenticationError
+from utils.httpx_client import (
+  ConditionalResult,
+  conditional_get,
+  parse_json,
+  validator_key,
+)
 from utils.httpx_client import async_httpx_client as client
+from utils.rate_limit import RateBudget
+
+
+def parse_contributor_count(response: httpx.Response) -> int:
+  """Gitee 在 total_count 响应头中返回总数，没有时按本页数量计算"""
+  total_count = response.headers.get("total_count")
+  if total_count is not None and total_count.isdigit():
+    return int(total_count)
+  return len(response.json())
 
 
 class GiteeAPI:
+  # 未使用用户令牌的请求共享匿名配额
+  rate_budget = RateBudget(reserve=Settings.API_RATE_LIMIT_RESERVE)
+
   @staticmethod
-  async def get(api: str, access_token: str = "", params: dict = {}):
+  async def get(
+    api: str,
+    access_token: str = "",
+    params: dict = {},
+    parse: Callable[[httpx.Response], Any] = parse_json,
+  ):
+    params = dict(params)
     if access_token:
       params["access_token"] = access_token
+    else:
+      await GiteeAPI.rate_budget.acquire()
     request = await client.get(
       f"https://gitee.com/api/v5{api}",
       params=params,
     )
+    if not access_token:
+      GiteeAPI.rate_budget.update(request.headers)
     if request.status_code != status.HTTP_200_OK:
       raise ApiError(api="Gitee API")
-    return request.json()
+    return parse(request)
+
+  @staticmethod
+  async def get_conditional(
+    api: str,
+    params: dict = {},
+    parse: Callable[[httpx.Response], Any] = parse_json,
+  ) -> ConditionalResult:
+    """条件请求，未变化时返回上次保存的内容"""
+    await GiteeAPI.rate_budget.acquire()
+    response, result = await conditional_get(
+      f"https://gitee.com/api/v5{api}", params=params, parse=parse
+    )
+    GiteeAPI.rate_budget.update(response.headers)
+    if result is None:
+      raise ApiError(api="Gitee API")
+    return result
+
+  @staticmethod
+  def validator_key(api: str, params: dict = {}) -> str:
+    """get_conditional 保存校验信息使用的 URL"""
+    return validator_key(f"https://gitee.com/api/v5{api}", params)
 
   @staticmethod
   async def get_current_user(access_token: str) -> dict[str, Any]:
@@ -41,9 +91,13 @@ class GiteeAPI:
       raise ApiError(api="Gitee 仓库信息")
 
   @staticmethod
-  async def get_repo_contributors(repo_id: str):
+  async def get_repo_contributor_count(repo_id: str) -> int:
     try:
-      return await GiteeAPI.get(f"/repos/{repo_id}/contributors")
+      return await GiteeAPI.get(
+        f"/repos/{repo_id}/contributors",
+        params={"per_page": 1},
+        parse=parse_contributor_count,
+      )
     except Exception:
       raise ApiError(api="Gitee 仓库贡献者信息")
 
@@ -1,23 +1,118 @@
-from typing import Any
+from typing import Any, Callable, Optional
+import httpx
 from fastapi import status
 from config import Settings
 from core.exceptions import ApiError
 from core.exceptions.client_errors import AuthenticationError
+from utils.httpx_client import (
+  ConditionalResult,
+  conditional_get,
+  parse_json,
+  validator_key,
+)
 from utils.httpx_client import async_httpx_client as client
+from utils.rate_limit import RateBudget
+
+
+def parse_contributor_count(response: httpx.Response) -> int:
+  """per_page=1 时最后一页的页码即为贡献者数"""
+  if response.status_code == status.HTTP_204_NO_CONTENT:
+    return 0
+  last = response.links.get("last")
+  if last:
+    return int(httpx.URL(last["url"]).params["page"])
+  return len(response.json())
+
+
+# 与 REST /repos/{repo_id} 对应的字段；REST 的 open_issues_count 包含未关闭的 PR，
+# GraphQL 没有贡献者数，仍由 REST 获取
+REPO_FIELDS_FRAGMENT = """
+fragment RepoFields on Repository {
+  name
+  nameWithOwner
+  homepageUrl
+  stargazerCount
+  forkCount
+  watchers { totalCount }
+  issues(states: OPEN) { totalCount }
+  pullRequests(states: OPEN) { totalCount }
+  licenseInfo { spdxId }
+  primaryLanguage { name }
+  pushedAt
+  createdAt
+  owner {
+    avatarUrl
+    ... on User { databaseId }
+    ... on Organization { databaseId }
+  }
+}
+"""
+
+
+def build_repos_query(repo_ids: list[str]) -> tuple[str, dict[str, str]]:
+  """每个仓库一个别名 r{i}，仓库名通过变量传入"""
+  declarations, fields, variables = [], [], {}
+  for i, repo_id in enumerate(repo_ids):
+    owner, _, name = repo_id.partition("/")
+    variables[f"o{i}"], variables[f"n{i}"] = owner, name
+    declarations.append(f"$o{i}: String!, $n{i}: String!")
+    fields.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...RepoFields }}")
+  selection = "\n".join(fields)
+  query = f"query({', '.join(declarations)}) {{\n{selection}\n}}\n"
+  return query + REPO_FIELDS_FRAGMENT, variables
 
 
 class GitHubAPI:
+  # 未使用用户令牌的请求共享 GITHUB_TOKEN（或匿名）的配额
+  rate_budget = RateBudget(reserve=Settings.API_RATE_LIMIT_RESERVE)
+  # GraphQL 按查询点数单独计算配额
+  graphql_rate_budget = RateBudget(reserve=Settings.API_RATE_LIMIT_RESERVE)
+
   @staticmethod
-  async def get(api: str, access_token: str = "", params: dict = {}):
+  async def get(
+    api: str,
+    access_token: str = "",
+    params: dict = {},
+    parse: Callable[[httpx.Response], Any] = parse_json,
+  ):
     headers = {}
-    if access_token:
-      headers = {"Authorization": f"Bearer {access_token}"}
+    token = access_token or Settings.GITHUB_TOKEN
+    if token:
+      headers = {"Authorization": f"Bearer {token}"}
+    if not access_token:
+      await GitHubAPI.rate_budget.acquire()
     request = await client.get(
-      "https://api.github.com" + api, headers=headers, params=params
+      Settings.GITHUB_API_URL + api, headers=headers, params=params
     )
-    if request.status_code != status.HTTP_200_OK:
+    if not access_token:
+      GitHubAPI.rate_budget.update(request.headers)
+    if request.status_code not in (status.HTTP_200_OK, status.HTTP_204_NO_CONTENT):
       raise ApiError(api="GitHub API")
-    return request.json()
+    return parse(request)
+
+  @staticmethod
+  async def get_conditional(
+    api: str,
+    params: dict = {},
+    parse: Callable[[httpx.Response], Any] = parse_json,
+  ) -> ConditionalResult:
+    """条件请求，未变化时返回上次保存的内容，304 不消耗 GitHub 的请求配额"""
+    headers = {}
+    if Settings.GITHUB_TOKEN:
+      headers = {"Authorization": f"Bearer {Settings.GITHUB_TOKEN}"}
+    await GitHubAPI.rate_budget.acquire()
+    response, result = await conditional_get(
+      Settings.GITHUB_API_URL + api, headers=headers, params=params, parse=parse
+    )
+    GitHubAPI.rate_budget.update(response.headers)
+    if result is None:
+      raise ApiError(api="GitHub API")
+    return result
+
+  @staticmethod
+  def validator_key(api: str, params: dict = {}) -> str:
+    """get_conditional 保存校验信息使用的 URL"""
+    return validator_key(Settings.GITHUB_API_URL + api, params)
 
   @staticmethod
   async def get_current_user(access_token: str) -> dict[str, Any]:
@@ -41,12 +136,45 @@ class GitHubAPI:
       raise ApiError(api="GitHub 仓库信息")
 
   @staticmethod
-  async def get_repo_contributors(repo_id: str, access_token: str = ""):
+  async def get_repo_contributor_count(repo_id: str, access_token: str = "") -> int:
     try:
-      return await GitHubAPI.get(f"/repos/{repo_id}/contributors", access_token)
+      return await GitHubAPI.get(
+        f"/repos/{repo_id}/contributors",
+        access_token,
+        params={"per_page": 1},
+        parse=parse_contributor_count,
+      )
     except Exception:
       raise ApiError(api="GitHub 仓库贡献者信息")
 
+  @staticmethod
+  async def get_repos_graphql(repo_ids: list[str]) -> list[Optional[dict[str, Any]]]:
+    """一次 GraphQL 查询获取多个仓库，按 repo_ids 的顺序返回，不存在的仓库为 None
+
+    GraphQL 只接受认证请求，需要配置 GITHUB_TOKEN。
+    """
+    if len(repo_ids) > Settings.GITHUB_GRAPHQL_BATCH_SIZE:
+      raise ValueError(f"单次最多查询 {Settings.GITHUB_GRAPHQL_BATCH_SIZE} 个仓库")
+    if not Settings.GITHUB_TOKEN:
+      raise ApiError(message="未配置 GITHUB_TOKEN", api="GitHub GraphQL API")
+    if not repo_ids:
+      return []
+    query, variables = build_repos_query(repo_ids)
+    await GitHubAPI.graphql_rate_budget.acquire()
+    response = await client.post(
+      Settings.GITHUB_GRAPHQL_URL,
+      headers={"Authorization": f"Bearer {Settings.GITHUB_TOKEN}"},
+      json={"query": query, "variables": variables},
+    )
+    GitHubAPI.graphql_rate_budget.update(response.headers)
+    if response.status_code != status.HTTP_200_OK:
+      raise ApiError(api="GitHub GraphQL API")
+    # 仓库不存在时对应别名为 null，并在 errors 中给出 NOT_FOUND，其余仓库照常返回
+    data = response.json().get("data")
+    if data is None:
+      raise ApiError(api="GitHub GraphQL API")
+    return [data.get(f"r{i}") for i in range(len(repo_ids))]
+
   @staticmethod
   async def oauth(code: str):
     try:
@@ -0,0 +1,70 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+
+def has_credentials(request: Request) -> bool:
+  return "authorization" in request.headers or "user_token" in request.cookies
+
+
+def cache_control(max_age: int = 0, public: bool = True, no_store: bool = False):
+  """设置 GET 响应 Cache-Control 的路由依赖
+
+  携带认证信息的请求为 private, no-cache：用户写入后立即可见，由 ETag 重新验证。
+  可缓存的响应带上 Vary，共享缓存不会把匿名响应返回给携带认证信息的请求。
+  路由上再次声明时以路由上的为准。
+  """
+
+  async def dependency(request: Request, response: Response):
+    if request.method not in ("GET", "HEAD"):
+      return
+    if no_store:
+      value = "no-store"
+    elif public and not has_credentials(request):
+      value = f"public, max-age={max_age}"
+    else:
+      value = "private, no-cache"
+    headers = {"Cache-Control": value}
+    if not no_store:
+      headers["Vary"] = "Authorization, Cookie"
+    # 直接返回 Response 的接口不会合并依赖设置的响应头，由 etag_response 读取
+    request.state.cache_headers = headers
+    response.headers.update(headers)
+
+  return dependency
+
+
+def make_etag(content: bytes) -> str:
+  return f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+  if not if_none_match:
+    return False
+  if if_none_match.strip() == "*":
+    return True
+  return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def etag_response(
+  request: Request,
+  content: bytes,
+  etag: Optional[str] = None,
+  media_type: str = "application/json",
+) -> Response:
+  """带 ETag 的响应，If-None-Match 匹配时返回 304"""
+  etag = etag or make_etag(content)
+  headers = {"ETag": etag, **getattr(request.state, "cache_headers", {})}
+  if etag_matches(request.headers.get("if-none-match"), etag):
+    return Response(status_code=304, headers=headers)
+  return Response(content=content, media_type=media_type, headers=headers)
+
+
+def model_etag_response(
+  request: Request, response_model: type[BaseModel], data: BaseModel
+) -> Response:
+  """按 response_model 序列化 data 并返回带 ETag 的响应"""
+  model = response_model.model_validate(data.model_dump(), from_attributes=True)
+  return etag_response(request, model.model_dump_json().encode())
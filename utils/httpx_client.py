@@ -1,3 +1,133 @@
+import json
+from contextvars import ContextVar
+from typing import Any, Callable, NamedTuple, Optional
+
 import httpx
 
+from models.models import HttpValidator
+from utils.time import now
+
 async_httpx_client = httpx.AsyncClient()
+
+UPSERT_VALIDATORS_SQL = """
+INSERT INTO http_validators (url, etag, last_modified, payload, updated_at)
+SELECT v.url, v.etag, v.last_modified, v.payload::jsonb, $5
+FROM unnest($1::text[], $2::text[], $3::text[], $4::text[])
+  AS v(url, etag, last_modified, payload)
+ORDER BY v.url
+ON CONFLICT (url) DO UPDATE SET
+  etag = EXCLUDED.etag,
+  last_modified = EXCLUDED.last_modified,
+  payload = EXCLUDED.payload,
+  updated_at = EXCLUDED.updated_at
+"""
+
+
+class ValidatorCache:
+  """按 URL 批量预读的校验信息，每条只使用一次，未预读的 URL 单独查询"""
+
+  def __init__(self):
+    self._validators: dict[str, Optional[HttpValidator]] = {}
+
+  async def preload(self, urls: list[str]):
+    urls = [url for url in urls if url not in self._validators]
+    if not urls:
+      return
+    found = {
+      validator.url: validator
+      for validator in await HttpValidator.filter(url__in=urls)
+    }
+    for url in urls:
+      self._validators[url] = found.get(url)
+
+  async def get(self, url: str) -> Optional[HttpValidator]:
+    if url in self._validators:
+      return self._validators.pop(url)
+    return await HttpValidator.get_or_none(url=url)
+
+
+# 批量同步时设置：条件请求从预读的缓存中取校验信息，新的校验信息收集到列表中，
+# 由调用方与业务数据在同一事务中写入，避免业务数据未写入而校验信息已更新
+validator_cache: ContextVar[Optional[ValidatorCache]] = ContextVar(
+  "validator_cache", default=None
+)
+deferred_validators: ContextVar[Optional[list[HttpValidator]]] = ContextVar(
+  "deferred_validators", default=None
+)
+
+
+def validator_key(url: str, params: Optional[dict] = None) -> str:
+  return str(httpx.URL(url, params=params))
+
+
+async def save_validators(conn, validators: list[HttpValidator]):
+  """在 conn 所在的事务中批量写入校验信息，同一 URL 以最后一条为准"""
+  latest = {validator.url: validator for validator in validators}
+  if not latest:
+    return
+  items = list(latest.values())
+  await conn.execute_query(
+    UPSERT_VALIDATORS_SQL,
+    [
+      [validator.url for validator in items],
+      [validator.etag for validator in items],
+      [validator.last_modified for validator in items],
+      [json.dumps(validator.payload) for validator in items],
+      now(),
+    ],
+  )
+
+
+class ConditionalResult(NamedTuple):
+  data: Any
+  # 为 False 表示服务端返回 304，data 为上次保存的内容
+  modified: bool
+
+
+def parse_json(response: httpx.Response) -> Any:
+  return response.json()
+
+
+async def conditional_get(
+  url: str,
+  headers: Optional[dict] = None,
+  params: Optional[dict] = None,
+  parse: Callable[[httpx.Response], Any] = parse_json,
+) -> tuple[httpx.Response, Optional[ConditionalResult]]:
+  """携带上次保存的 ETag / Last-Modified 发起条件请求
+
+  返回 2xx 或 304 时附带结果，其他状态码结果为 None；保存的是 parse 的结果，
+  validator 按不含凭据的 URL 保存，设置了 deferred_validators 时只收集不写入。
+  """
+  key = validator_key(url, params)
+  cache = validator_cache.get()
+  if cache is not None:
+    validator = await cache.get(key)
+  else:
+    validator = await HttpValidator.get_or_none(url=key)
+  headers = dict(headers or {})
+  if validator is not None:
+    if validator.etag:
+      headers["If-None-Match"] = validator.etag
+    if validator.last_modified:
+      headers["If-Modified-Since"] = validator.last_modified
+  response = await async_httpx_client.get(url, headers=headers, params=params)
+  if response.status_code == 304 and validator is not None:
+    return response, ConditionalResult(validator.payload, False)
+  if response.status_code not in (200, 204):
+    return response, None
+  data = parse(response)
+  etag = response.headers.get("etag")
+  last_modified = response.headers.get("last-modified")
+  if etag or last_modified:
+    deferred = deferred_validators.get()
+    if deferred is not None:
+      deferred.append(
+        HttpValidator(url=key, etag=etag, last_modified=last_modified, payload=data)
+      )
+    else:
+      await HttpValidator.update_or_create(
+        url=key,
+        defaults={"etag": etag, "last_modified": last_modified, "payload": data},
+      )
+  return response, ConditionalResult(data, True)
@@ -0,0 +1,92 @@
+import hashlib
+import math
+from typing import Iterable, Optional
+
+
+# 序列化格式的首字节
+SPARSE_FORMAT, PACKED_FORMAT = 0xF0, 0xF1
+
+
+class HyperLogLog:
+  """HyperLogLog 基数估计，2^precision 个寄存器
+
+  两个相同精度的草图逐寄存器取最大值即可合并。序列化时非零寄存器较少则按
+  (序号, 值) 稀疏存储，否则每个寄存器压缩为 6 位。
+  """
+
+  def __init__(self, precision: int = 12, registers: Optional[bytes] = None):
+    if not 4 <= precision <= 16:
+      raise ValueError("precision 需在 4 到 16 之间")
+    self.precision = precision
+    self.m = 1 << precision
+    self.registers = bytearray(registers) if registers else bytearray(self.m)
+    if len(self.registers) != self.m:
+      raise ValueError("寄存器数量与精度不匹配")
+
+  @classmethod
+  def from_bytes(cls, data: bytes, precision: int = 12) -> "HyperLogLog":
+    """从 bytes 恢复，空 bytes 返回空草图"""
+    if not data:
+      return cls(precision)
+    if data[0] == SPARSE_FORMAT:
+      sketch = cls(data[1])
+      for i in range(2, len(data), 3):
+        sketch.registers[int.from_bytes(data[i : i + 2], "big")] = data[i + 2]
+      return sketch
+    if data[0] != PACKED_FORMAT:
+      raise ValueError("未知的草图格式")
+    sketch = cls(data[1])
+    registers = sketch.registers
+    for i, offset in enumerate(range(2, len(data), 3)):
+      value = int.from_bytes(data[offset : offset + 3], "big")
+      registers[4 * i : 4 * i + 4] = bytes(
+        (value >> 18, (value >> 12) & 63, (value >> 6) & 63, value & 63)
+      )
+    return sketch
+
+  def to_bytes(self) -> bytes:
+    header = bytes((SPARSE_FORMAT, self.precision))
+    nonzero = [(i, rank) for i, rank in enumerate(self.registers) if rank]
+    # 每个非零寄存器 3 字节，少于压缩格式的 3/4 字节每寄存器时使用稀疏格式
+    if len(nonzero) * 4 < self.m:
+      return header + b"".join(
+        i.to_bytes(2, "big") + bytes((rank,)) for i, rank in nonzero
+      )
+    registers = self.registers
+    packed = bytearray((PACKED_FORMAT, self.precision))
+    for i in range(0, self.m, 4):
+      a, b, c, d = registers[i : i + 4]
+      packed += (a << 18 | b << 12 | c << 6 | d).to_bytes(3, "big")
+    return bytes(packed)
+
+  def add(self, item: str | bytes):
+    if isinstance(item, str):
+      item = item.encode()
+    value = int.from_bytes(hashlib.blake2b(item, digest_size=8).digest(), "big")
+    index = value >> (64 - self.precision)
+    rest = value & ((1 << (64 - self.precision)) - 1)
+    rank = 64 - self.precision - rest.bit_length() + 1
+    if rank > self.registers[index]:
+      self.registers[index] = rank
+
+  def update(self, items: Iterable[str | bytes]):
+    for item in items:
+      self.add(item)
+
+  def merge(self, other: "HyperLogLog"):
+    if other.precision != self.precision:
+      raise ValueError("只能合并相同精度的草图")
+    self.registers = bytearray(map(max, self.registers, other.registers))
+
+  def count(self) -> int:
+    m = self.m
+    if m >= 128:
+      alpha = 0.7213 / (1 + 1.079 / m)
+    else:
+      alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+    estimate = alpha * m * m / sum(2.0**-register for register in self.registers)
+    zeros = self.registers.count(0)
+    # 小基数时使用线性计数修正
+    if estimate <= 2.5 * m and zeros:
+      estimate = m * math.log(m / zeros)
+    return round(estimate)
@@ -0,0 +1,127 @@
+import heapq
+from typing import Hashable, Optional
+
+
+class _Node:
+  __slots__ = ("children", "ids", "top")
+
+  def __init__(self):
+    self.children: dict[str, _Node] = {}
+    # 以该节点结尾的条目 -> 匹配级别
+    self.ids: dict[Hashable, int] = {}
+    # 子树内排序最前的 top_k 个 (匹配级别, 条目)，None 表示需要重新计算
+    self.top: Optional[list[tuple[int, Hashable]]] = None
+
+
+class PrefixIndex:
+  """进程内前缀索引（字典树），按匹配级别、rank 从高到低返回前缀匹配的条目
+
+  一个条目可以有多个索引键，每个键带一个匹配级别（越小越优先）。
+  每个节点缓存子树内的前 top_k 个条目，查询只需沿前缀走到对应节点。
+  """
+
+  def __init__(self, top_k: int = 10):
+    self.top_k = top_k
+    self._root = _Node()
+    # id -> (文本, rank, {索引键: 匹配级别})
+    self._entries: dict[Hashable, tuple[str, float, dict[str, int]]] = {}
+
+  def __len__(self):
+    return len(self._entries)
+
+  def __contains__(self, entry_id: Hashable):
+    return entry_id in self._entries
+
+  def _sort_key(self, item: tuple[int, Hashable]):
+    level, entry_id = item
+    return (level, -self._entries[entry_id][1], entry_id)
+
+  def add(
+    self,
+    entry_id: Hashable,
+    text: str,
+    rank: float = 0,
+    keys: Optional[dict[str, int]] = None,
+  ):
+    """添加或更新条目，keys 默认为 {小写的 text: 0}"""
+    self.remove(entry_id)
+    keys = keys if keys is not None else {text.lower(): 0}
+    self._entries[entry_id] = (text, rank, keys)
+    for key, level in keys.items():
+      node = self._root
+      self._offer(node, entry_id, level)
+      for char in key:
+        node = node.children.setdefault(char, _Node())
+        self._offer(node, entry_id, level)
+      node.ids[entry_id] = min(level, node.ids.get(entry_id, level))
+
+  def _offer(self, node: _Node, entry_id: Hashable, level: int):
+    if node.top is None:
+      return
+    top = node.top
+    for index, (top_level, top_id) in enumerate(top):
+      if top_id == entry_id:
+        if top_level <= level:
+          return
+        del top[index]
+        break
+    item = (level, entry_id)
+    if len(top) >= self.top_k and self._sort_key(item) > self._sort_key(top[-1]):
+      return
+    top.append(item)
+    top.sort(key=self._sort_key)
+    del top[self.top_k :]
+
+  def remove(self, entry_id: Hashable):
+    entry = self._entries.pop(entry_id, None)
+    if entry is None:
+      return
+    for key in entry[2]:
+      path = [self._root]
+      for char in key:
+        child = path[-1].children.get(char)
+        if child is None:
+          break
+        path.append(child)
+      else:
+        path[-1].ids.pop(entry_id, None)
+      for node in path:
+        if node.top is not None and any(item[1] == entry_id for item in node.top):
+          node.top = None
+      # 清理空节点
+      for depth in range(len(path) - 1, 0, -1):
+        node = path[depth]
+        if node.ids or node.children:
+          break
+        del path[depth - 1].children[key[depth - 1]]
+
+  def clear(self):
+    self._root = _Node()
+    self._entries.clear()
+
+  def _top(self, node: _Node) -> list[tuple[int, Hashable]]:
+    if node.top is None:
+      levels: dict[Hashable, int] = {}
+      stack = [node]
+      while stack:
+        current = stack.pop()
+        for entry_id, level in current.ids.items():
+          if level < levels.get(entry_id, level + 1):
+            levels[entry_id] = level
+        stack.extend(current.children.values())
+      node.top = heapq.nsmallest(
+        self.top_k,
+        ((level, entry_id) for entry_id, level in levels.items()),
+        key=self._sort_key,
+      )
+    return node.top
+
+  def search(self, prefix: str, limit: Optional[int] = None) -> list[str]:
+    node = self._root
+    for char in prefix.lower():
+      child = node.children.get(char)
+      if child is None:
+        return []
+      node = child
+    limit = self.top_k if limit is None else min(limit, self.top_k)
+    return [self._entries[entry_id][0] for _, entry_id in self._top(node)[:limit]]
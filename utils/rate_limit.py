@@ -0,0 +1,57 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Mapping, Optional
+
+# 后台任务中置为 True，只有后台请求会在配额不足时等待
+background_requests: ContextVar[bool] = ContextVar("background_requests", default=False)
+
+
+class RateBudget:
+  """按 X-RateLimit-Remaining / X-RateLimit-Reset 响应头维护的请求配额
+
+  剩余次数不超过 reserve 时，后台请求在 acquire 中等待到配额重置，为交互请求保留余量；
+  交互请求不等待。
+  """
+
+  def __init__(self, reserve: int = 0, max_wait: float = 3600):
+    self.reserve = reserve
+    self.max_wait = max_wait
+    self.remaining: Optional[int] = None
+    self.reset_at = 0.0
+    self._lock = asyncio.Lock()
+
+  def _exhausted(self) -> bool:
+    if self.remaining is None:
+      return False
+    if time.time() >= self.reset_at:
+      # 已过重置时间，以下一次响应头为准
+      self.remaining = None
+      return False
+    return self.remaining <= self.reserve
+
+  async def acquire(self):
+    if not background_requests.get():
+      if self.remaining is not None:
+        self.remaining -= 1
+      return
+    # 持有锁等待，配额耗尽时其他后台请求也排队等待
+    async with self._lock:
+      if self._exhausted():
+        await asyncio.sleep(min(max(self.reset_at - time.time(), 0), self.max_wait))
+        self.remaining = None
+      if self.remaining is not None:
+        self.remaining -= 1
+
+  def update(self, headers: Mapping[str, str]):
+    remaining = headers.get("x-ratelimit-remaining")
+    reset = headers.get("x-ratelimit-reset")
+    try:
+      if remaining is not None:
+        self.remaining = int(remaining)
+      if reset is not None:
+        reset_at = float(reset)
+        # GitHub 为时间戳，部分平台为剩余秒数
+        self.reset_at = reset_at if reset_at > 1e9 else time.time() + reset_at
+    except ValueError:
+      pass
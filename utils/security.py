@@ -1,7 +1,8 @@
+import hashlib
 from datetime import timedelta, datetime, UTC
 from typing import Optional
 
-from fastapi import Cookie, Security, HTTPException
+from fastapi import Cookie, Request, Security, HTTPException
 from fastapi.security import (
   HTTPAuthorizationCredentials,
   HTTPBearer,
@@ -101,6 +102,34 @@ async def verify_current_user(
     raise AuthenticationError(auth="JWT Token")
 
 
+async def get_optional_user(
+  header_token: Optional[str] = Security(oauth2_password_scheme),
+  user_token: Optional[str] = Cookie(None),
+) -> Optional[UserPayloadData]:
+  """获取当前用户，未登录或令牌无效时返回 None"""
+  try:
+    return await verify_current_user(header_token, user_token)
+  except AuthenticationError:
+    return None
+
+
+async def get_visitor_id(
+  request: Request,
+  payload: Optional[UserPayloadData] = Security(get_optional_user),
+) -> str:
+  """访客标识：登录用户为用户ID，否则为 IP 与 User-Agent 的摘要"""
+  if payload is not None:
+    return f"u:{payload.id}"
+  forwarded = request.headers.get("x-forwarded-for")
+  if forwarded:
+    ip = forwarded.split(",")[0].strip()
+  else:
+    ip = request.client.host if request.client else ""
+  user_agent = request.headers.get("user-agent", "")
+  digest = hashlib.blake2b(f"{ip}|{user_agent}".encode(), digest_size=16).hexdigest()
+  return f"c:{digest}"
+
+
 async def verify_current_admin_user(
   payload: UserPayloadData = Security(verify_current_user),
 ) -> UserPayloadData:
@@ -0,0 +1,62 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Hashable, Optional, TypeVar
+
+R = TypeVar("R")
+
+
+class SingleFlight:
+  """合并相同 key 的并发调用：同一时间只执行一次，所有调用方共享结果或异常"""
+
+  def __init__(self, timeout: Optional[float] = None):
+    self.timeout = timeout
+    self._calls: dict[Hashable, asyncio.Task] = {}
+
+  async def do(self, key: Hashable, func: Callable[[], Awaitable[R]]) -> R:
+    task = self._calls.get(key)
+    if task is None:
+      # 超时作用于共享的调用，超时后所有等待方都会收到 TimeoutError
+      task = asyncio.ensure_future(asyncio.wait_for(func(), self.timeout))
+      self._calls[key] = task
+      task.add_done_callback(lambda _: self._forget_task(key, task))
+    # 单个调用方被取消时不影响其他等待方
+    return await asyncio.shield(task)
+
+  def _forget_task(self, key: Hashable, task: asyncio.Task):
+    if self._calls.get(key) is task:
+      del self._calls[key]
+
+  def forget(self, key: Hashable):
+    """之后的调用不再复用进行中的调用，用于数据已被修改的情况"""
+    self._calls.pop(key, None)
+
+  def __len__(self):
+    return len(self._calls)
+
+
+def single_flight(timeout: Optional[float] = None):
+  """以函数参数为 key 合并并发调用
+
+  调用在首个调用方的上下文中执行，后续调用方可能拿到其事务内的结果，
+  只用于事务外的只读查询。
+  """
+
+  def decorator(func: Callable[..., Awaitable[R]]) -> Callable[..., Awaitable[R]]:
+    flight = SingleFlight(timeout)
+
+    def make_key(*args: Any, **kwargs: Any) -> Hashable:
+      return (args, tuple(sorted(kwargs.items())))
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> R:
+      return await flight.do(
+        make_key(*args, **kwargs), functools.partial(func, *args, **kwargs)
+      )
+
+    wrapper.flight = flight  # pyright: ignore
+    wrapper.forget = lambda *args, **kwargs: flight.forget(  # pyright: ignore
+      make_key(*args, **kwargs)
+    )
+    return wrapper
+
+  return decorator